@@ -1,22 +1,237 @@
-# Optional helper module for API-Sport interactions.
-# Currently the main code uses direct requests; you can extend here.
-import os
-import requests
-from datetime import datetime, timedelta
-
-API_SPORT_KEY = os.getenv("API_SPORT_KEY")
-BASE = "https://app.api-sport.ru/api/football"
-
-def fetch_matches_within(hours=2):
-    now = datetime.utcnow()
-    to = now + timedelta(hours=hours)
-    params = {
-        "from": now.strftime("%Y-%m-%d %H:%M:%S"),
-        "to": to.strftime("%Y-%m-%d %H:%M:%S"),
-        "timezone": "UTC"
-    }
-    headers = {"X-API-KEY": API_SPORT_KEY}
-    url = f"{BASE}/matches"
-    r = requests.get(url, headers=headers, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+# Клиент API-Sport: единственная точка обращения к провайдеру.
+# Повторы с джиттером на 5xx/таймаутах, circuit breaker на время
+# недоступности провайдера и учет платной квоты запросов.
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+
+from http_client import HttpClient
+from metrics import Histogram
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.api-sport.ru/v1/football"
+
+# Каждая попытка запроса: HTTP-код, timeout или error (сетевая ошибка)
+REQUEST_SECONDS = Histogram("api_sport_request_seconds", "Запросы к API-Sport", ("status",))
+
+
+class ApiSportError(Exception):
+    """Ошибка обращения к API-Sport; status_code — HTTP-код для наших клиентов"""
+
+    def __init__(self, status_code: int, message: Optional[str] = None):
+        super().__init__(message or f"Ошибка API: {status_code}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(ApiSportError):
+    def __init__(self):
+        super().__init__(503, "API-Sport временно недоступен")
+
+
+class QuotaExceededError(ApiSportError):
+    def __init__(self):
+        super().__init__(503, "Исчерпана квота запросов к API-Sport")
+
+
+class QuotaBudget:
+    """Бюджет запросов: скользящая минута и календарные сутки (UTC). 0 — без лимита."""
+
+    def __init__(self, per_minute: int = 0, per_day: int = 0):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self._minute: Deque[float] = deque()
+        self._day = datetime.utcnow().date()
+        self._day_used = 0
+
+    def _refresh(self, now: float):
+        while self._minute and now - self._minute[0] >= 60:
+            self._minute.popleft()
+        today = datetime.utcnow().date()
+        if today != self._day:
+            self._day = today
+            self._day_used = 0
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self._refresh(now)
+        if self.per_minute and len(self._minute) >= self.per_minute:
+            return False
+        if self.per_day and self._day_used >= self.per_day:
+            return False
+        self._minute.append(now)
+        self._day_used += 1
+        return True
+
+    def remaining_ratio(self) -> float:
+        """Доля оставшегося бюджета по самому узкому окну (1.0 — без лимитов)"""
+        self._refresh(time.monotonic())
+        ratios = [1.0]
+        if self.per_minute:
+            ratios.append(1 - len(self._minute) / self.per_minute)
+        if self.per_day:
+            ratios.append(1 - self._day_used / self.per_day)
+        return max(0.0, min(ratios))
+
+    def ttl_factor(self, low_watermark: float = 0.5, max_factor: float = 4.0) -> float:
+        """Во сколько раз растянуть TTL кэша: 1 при запасе выше low_watermark, до max_factor при нуле"""
+        ratio = self.remaining_ratio()
+        if ratio >= low_watermark:
+            return 1.0
+        return 1.0 + (max_factor - 1.0) * (1 - ratio / low_watermark)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refresh(time.monotonic())
+        return {
+            "minute_used": len(self._minute), "per_minute": self.per_minute,
+            "day_used": self._day_used, "per_day": self.per_day,
+            "remaining_ratio": round(self.remaining_ratio(), 4),
+        }
+
+
+class CircuitBreaker:
+    """После failure_threshold неудач подряд запросы не идут reset_timeout секунд,
+    затем пропускается один пробный запрос."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe:
+            self._probe = True
+            return True
+        return False
+
+    def release_probe(self):
+        """Пробный запрос завершился без ответа провайдера (квота, отмена)"""
+        self._probe = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            log.info("✅ API-Sport снова отвечает, circuit breaker закрыт")
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                log.warning(f"⚡ API-Sport недоступен ({self.failures} ошибок подряд), пауза {self.reset_timeout} с")
+            self.opened_at = time.monotonic()
+
+
+class ApiSportClient:
+    def __init__(
+        self,
+        http: HttpClient,
+        api_key: str,
+        base_url: str = DEFAULT_BASE_URL,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[QuotaBudget] = None,
+    ):
+        self.http = http
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or QuotaBudget()
+        self._headers = {"Authorization": api_key}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "rejected_open": 0, "rejected_quota": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: случайная пауза до экспоненциального предела
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        probing = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.stats["rejected_open"] += 1
+            raise CircuitOpenError()
+        try:
+            with span("api_sport.get", path=path):
+                return await self._get_with_retries(path, params)
+        finally:
+            if probing:
+                self.breaker.release_probe()
+
+    async def _get_with_retries(self, path: str, params: Optional[Dict[str, Any]]) -> Any:
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        error: ApiSportError = ApiSportError(502)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt - 1))
+            if not self.budget.try_acquire():
+                self.stats["rejected_quota"] += 1
+                raise QuotaExceededError()
+            self.stats["requests"] += 1
+            start = time.perf_counter()
+            with span("api_sport.request", attempt=attempt) as request_span:
+                try:
+                    status, data = await self.http.get_json(url, params=params, headers=self._headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    timeout = isinstance(e, asyncio.TimeoutError)
+                    REQUEST_SECONDS.observe(time.perf_counter() - start, "timeout" if timeout else "error")
+                    request_span.set(error=type(e).__name__)
+                    log.warning(f"API-Sport {path}: {type(e).__name__} {e}")
+                    error = ApiSportError(504 if timeout else 502)
+                    continue
+                REQUEST_SECONDS.observe(time.perf_counter() - start, str(status))
+                request_span.set(status=status)
+            if status == 200:
+                self.breaker.record_success()
+                return data
+            log.warning(f"API-Sport {path}: HTTP {status}")
+            error = ApiSportError(status)
+            if status < 500 and status != 429:
+                # Ошибка запроса, а не провайдера: повтор не поможет
+                self.breaker.record_success()
+                self.stats["errors"] += 1
+                raise error
+        self.stats["errors"] += 1
+        self.breaker.record_failure()
+        raise error
+
+    async def matches(self, date: str, status=None, tournament_id=None, team_id=None) -> List[Dict]:
+        """Список матчей за дату"""
+        params = {"date": date, "status": status, "tournament_id": tournament_id, "team_id": team_id}
+        data = await self.get("matches", {k: v for k, v in params.items() if v})
+        matches = data.get("matches", []) if isinstance(data, dict) else None
+        if not isinstance(matches, list):
+            log.warning(f"API-Sport matches: неожиданный ответ {type(data).__name__}")
+            raise ApiSportError(502, "Некорректный ответ API")
+        return matches
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["circuit"] = self.breaker.state
+        stats["quota"] = self.budget.snapshot()
+        return stats
@@ -0,0 +1,109 @@
+# Общий TTL-кэш с single-flight для запросов к API-Sport.
+# Один экземпляр на процесс: параллельные промахи по одному ключу
+# объединяются в один запрос к upstream. Бот и API работают в одном
+# event loop, поэтому блокировки не нужны.
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _LoadCancelled(Exception):
+    """Загрузку отменили вместе с запросом-владельцем; ждущие повторяют ее сами"""
+
+
+class TTLCache:
+    """TTL-кэш с объединением одновременных промахов"""
+
+    def __init__(self, default_ttl: float = 300.0, max_entries: int = 1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._entries.items() if exp < now]:
+            del self._entries[k]
+        if len(self._entries) >= self.max_entries:
+            # Удаляем запись, которая истекает раньше всех
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _finish(self, key: Hashable, future: asyncio.Future, error: BaseException):
+        self._inflight.pop(key, None)
+        future.set_exception(error)
+        # Без ждущих исключение никто не заберет — не пишем об этом в лог
+        future.exception()
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None
+    ) -> Any:
+        """Вернуть значение из кэша или загрузить его ровно одним вызовом loader.
+
+        Если загрузка по ключу уже идет, вызывающий ждет ее результата.
+        Исключения из loader не кэшируются и передаются всем ждущим. Если
+        отменили самого загружающего, ждущие не получают CancelledError:
+        первый из них начинает загрузку заново.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                # shield: отмена одного ждущего не отменяет общую загрузку
+                return await asyncio.shield(future)
+            except _LoadCancelled:
+                continue
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._finish(key, future, _LoadCancelled())
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            self._finish(key, future, e)
+            raise
+        self._inflight.pop(key, None)
+        self.set(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["entries"] = len(self._entries)
+        stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+        return stats
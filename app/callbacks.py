@@ -0,0 +1,146 @@
+# Маршрутизация callback-запросов inline-кнопок.
+# callback_data кодируется компактно: "<версия>:<действие>:<поле>:<поле>...",
+# обработчик находится одним поиском в словаре и получает уже
+# разобранные и приведенные к нужному типу аргументы.
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+log = logging.getLogger(__name__)
+
+VERSION = "1"
+SEPARATOR = ":"
+# Лимит Telegram на callback_data в байтах
+MAX_CALLBACK_DATA = 64
+
+Field = Tuple[str, Callable[[str], Any]]
+# Ключ в data aiogram, под которым RouteMiddleware кладет разобранный маршрут
+ROUTE_KEY = "callback_route"
+
+
+def pack(action: str, *args: Any) -> str:
+    """callback_data для действия с аргументами"""
+    parts = [VERSION, action]
+    for arg in args:
+        value = str(arg)
+        if SEPARATOR in value:
+            raise ValueError(f"Недопустимый символ в аргументе callback_data: {value!r}")
+        parts.append(value)
+    data = SEPARATOR.join(parts)
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data длиннее {MAX_CALLBACK_DATA} байт: {data!r}")
+    return data
+
+
+@dataclass(frozen=True)
+class Route:
+    action: str
+    handler: Callable[..., Awaitable[Any]]
+    fields: Tuple[Field, ...] = ()
+
+    def parse(self, values: Sequence[str]) -> Optional[Dict[str, Any]]:
+        if len(values) != len(self.fields):
+            return None
+        try:
+            return {name: convert(value) for (name, convert), value in zip(self.fields, values)}
+        except ValueError:
+            return None
+
+
+class CallbackRouter:
+    """Словарь действие -> обработчик вместо цепочки фильтров.
+
+    Кнопки из старых сообщений ("get_matches", "league_premier_league")
+    продолжают работать: точные значения и префиксы "<слово>_" до
+    первого подчеркивания тоже ищутся по словарю.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Route] = {}
+        self._legacy: Dict[str, Tuple[Route, Tuple[str, ...]]] = {}
+        self._legacy_prefixes: Dict[str, Route] = {}
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def register(self, action: str, handler: Callable[..., Awaitable[Any]], fields: Sequence[Field] = (),
+                 legacy: Sequence[str] = (), legacy_prefix: Optional[str] = None) -> Route:
+        if action in self._routes:
+            raise ValueError(f"Действие {action!r} уже зарегистрировано")
+        route = Route(action, handler, tuple(fields))
+        self._routes[action] = route
+        for data in legacy:
+            self._legacy[data] = (route, ())
+        if legacy_prefix is not None:
+            # Старый формат "<префикс>_<единственный аргумент>"
+            self._legacy_prefixes[legacy_prefix] = route
+        return route
+
+    def route(self, action: str, *fields: Field, legacy: Sequence[str] = (), legacy_prefix: Optional[str] = None):
+        """Декоратор: @router.route("lg", ("league_key", str), legacy_prefix="league")"""
+        def decorator(handler):
+            self.register(action, handler, fields, legacy, legacy_prefix)
+            return handler
+        return decorator
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        if not data:
+            return None
+        parts = data.split(SEPARATOR)
+        if len(parts) >= 2 and parts[0] == VERSION:
+            route = self._routes.get(parts[1])
+            if route is None:
+                return None
+            args = route.parse(parts[2:])
+            return (route, args) if args is not None else None
+
+        legacy = self._legacy.get(data)
+        if legacy is not None:
+            route, values = legacy
+            return route, route.parse(values)
+        prefix, _, rest = data.partition("_")
+        route = self._legacy_prefixes.get(prefix)
+        if route is not None and rest:
+            args = route.parse((rest,))
+            return (route, args) if args is not None else None
+        return None
+
+    def handler_name(self, callback, data: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Имя обработчика, который получит кнопку (для метрик)"""
+        resolved = data[ROUTE_KEY] if data and ROUTE_KEY in data else self.resolve(callback.data)
+        return resolved[0].handler.__name__ if resolved is not None else None
+
+    async def dispatch(self, callback, resolved: Optional[Tuple[Route, Dict[str, Any]]] = None, **kwargs) -> bool:
+        """Вызвать обработчик кнопки; False, если маршрут не найден.
+
+        resolved — маршрут, уже найденный RouteMiddleware.
+        """
+        if resolved is None:
+            resolved = self.resolve(callback.data)
+        if resolved is None:
+            return False
+        route, args = resolved
+        await route.handler(callback, **args, **kwargs)
+        return True
+
+
+class RouteMiddleware(BaseMiddleware):
+    """Inner-middleware: маршрут кнопки ищется один раз на callback и
+    кладется в data[ROUTE_KEY] для метрик, трассировки и dispatch.
+    Регистрируется раньше остальных inner-middleware callback_query."""
+
+    def __init__(self, router: CallbackRouter):
+        self.router = router
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, CallbackQuery):
+            data[ROUTE_KEY] = self.router.resolve(event.data)
+        return await handler(event, data)
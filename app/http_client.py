@@ -0,0 +1,72 @@
+# Общий асинхронный HTTP-клиент с пулом keep-alive соединений.
+# aiohttp уже приходит вместе с aiogram, отдельная зависимость не нужна.
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Пул соединений для всех исходящих HTTP-запросов бота.
+
+    Бот и FastAPI работают в одном event loop, поэтому сессия одна;
+    она создается на старте и закрывается при остановке.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        keepalive_timeout: float = 30.0,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Создать сессию заранее, на старте"""
+        self.session()
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, Any]:
+        """GET-запрос; возвращает (status, json). При не-200 json равен None."""
+        if params:
+            params = {k: str(v) for k, v in params.items() if v is not None}
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        async with self.session().get(url, params=params, headers=headers, **kwargs) as resp:
+            if resp.status != 200:
+                return resp.status, None
+            with span("http.json"):
+                return resp.status, await resp.json(content_type=None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            log.info("HTTP-клиент закрыт")
+        self._session = None
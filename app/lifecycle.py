@@ -0,0 +1,59 @@
+# Запуск uvicorn и aiogram в одном event loop и их согласованная остановка.
+import asyncio
+import contextlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set
+
+import uvicorn
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+log = logging.getLogger(__name__)
+
+
+class ApiServer(uvicorn.Server):
+    """uvicorn без собственной обработки сигналов: ею управляет main()"""
+
+    def install_signal_handlers(self):
+        pass
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+class InFlightTracker(BaseMiddleware):
+    """Outer-middleware, запоминающий задачи, которые сейчас обрабатывают апдейты.
+
+    Polling aiogram создает задачу на каждый апдейт и не хранит ссылок
+    на нее, поэтому дождаться их при остановке можно только так.
+    """
+
+    def __init__(self):
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self.tasks.discard(task)
+
+    async def drain(self, timeout: float, extra: Iterable[asyncio.Task] = ()):
+        """Дождаться текущих обработчиков; по таймауту — отменить оставшиеся"""
+        pending = {t for t in self.tasks | set(extra) if t is not asyncio.current_task() and not t.done()}
+        if not pending:
+            return
+        log.info(f"⏳ Ожидаю завершения {len(pending)} обработчиков")
+        done, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            log.warning(f"Прервано обработчиков по таймауту: {len(pending)}")
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,133 @@
+# Изменения матчей между соседними снимками и их рассылка подписчикам.
+# Снимок сравнивается с предыдущим один раз, а уведомления, Mini App
+# и прочие потребители получают только изменения.
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from match_service import Match, today_utc
+from match_store import match_key
+
+log = logging.getLogger(__name__)
+
+# Виды событий
+ADDED = "added"        # матч появился в списке даты
+SCORE = "score"        # изменился счет
+STATUS = "status"      # сменился статус (notstarted -> inprogress -> finished)
+REMOVED = "removed"    # матч пропал из списка даты
+
+
+@dataclass(frozen=True)
+class MatchEvent:
+    kind: str
+    date: str
+    key: str
+    match: Match
+    previous: Optional[Match] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.kind == STATUS and self.match.status == 'finished'
+
+    def to_payload(self) -> Dict[str, Any]:
+        payload = {"type": self.kind, "key": self.key, "match": self.match.raw}
+        if self.previous is not None:
+            payload["previous"] = {
+                "status": self.previous.status,
+                "home_score": self.previous.home_score,
+                "away_score": self.previous.away_score,
+            }
+        return payload
+
+
+EventHandler = Callable[[List[MatchEvent]], Any]
+
+
+class EventBus:
+    """Внутрипроцессная шина событий.
+
+    Обработчики (sync или async) вызываются по очереди с пачкой событий
+    одного снимка. Очереди подписчиков (например, SSE-соединений)
+    ограничены: при переполнении выбрасываются самые старые пачки.
+    """
+
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+        # Очередь, которую никто больше не читает (соединение оборвалось
+        # до начала потока), исчезает из шины сама
+        self._queues: "weakref.WeakSet[asyncio.Queue]" = weakref.WeakSet()
+        self.stats = {"published": 0, "events": 0, "dropped": 0}
+
+    def subscribe(self, handler: EventHandler):
+        self._handlers.append(handler)
+
+    def open_queue(self, maxsize: int = 100) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._queues.add(queue)
+        return queue
+
+    def close_queue(self, queue: asyncio.Queue):
+        self._queues.discard(queue)
+
+    async def publish(self, events: List[MatchEvent]):
+        if not events:
+            return
+        self.stats["published"] += 1
+        self.stats["events"] += len(events)
+        for handler in self._handlers:
+            try:
+                result = handler(events)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                log.exception("Ошибка обработчика событий матчей")
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(events)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._handlers) + len(self._queues)
+
+
+class DeltaEngine:
+    """Хранит предыдущий снимок каждой даты и публикует разницу с новым"""
+
+    def __init__(self, bus: EventBus):
+        self.bus = bus
+        self._previous: Dict[str, Dict[str, Match]] = {}
+
+    def diff(self, date: str, matches: List[Match]) -> List[MatchEvent]:
+        previous = self._previous.get(date, {})
+        current: Dict[str, Match] = {}
+        events: List[MatchEvent] = []
+        for match in matches:
+            key = match_key(match)
+            current[key] = match
+            prev = previous.get(key)
+            if prev is None:
+                events.append(MatchEvent(ADDED, date, key, match))
+                continue
+            if prev.status != match.status:
+                events.append(MatchEvent(STATUS, date, key, match, prev))
+            if (prev.home_score, prev.away_score) != (match.home_score, match.away_score):
+                events.append(MatchEvent(SCORE, date, key, match, prev))
+        for key in previous.keys() - current.keys():
+            events.append(MatchEvent(REMOVED, date, key, previous[key], previous[key]))
+
+        self._previous[date] = current
+        # Прошедшие дни больше не сравниваем
+        today = today_utc()
+        for old in [d for d in self._previous if d < today]:
+            del self._previous[old]
+        return events
+
+    async def on_snapshot(self, snapshot):
+        events = self.diff(snapshot.date, snapshot.matches)
+        if events:
+            log.debug(f"Изменений в матчах {snapshot.date}: {len(events)}")
+            await self.bus.publish(events)
@@ -0,0 +1,160 @@
+# Поток обновлений матчей для Mini App (Server-Sent Events).
+# Клиент получает текущий список один раз, а дальше — только изменения
+# из шины live_events, поэтому все открытые Mini App обслуживаются
+# одним фоновым опросом API-Sport.
+import asyncio
+import json
+import logging
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Set, Union
+
+from live_events import ADDED, REMOVED, EventBus, MatchEvent
+from match_service import Match, today_utc
+from match_store import match_key
+
+log = logging.getLogger(__name__)
+
+# Через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = 3000
+
+
+def sse(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class LiveFeed:
+    """SSE-соединения Mini App поверх EventBus.
+
+    relevant(match) решает, показывать ли матч, которого у клиента еще
+    нет; матчи, уже отправленные в соединение, обновляются до удаления.
+    on_snapshot перепроверяет relevant по каждому снимку: матч, который
+    вошел в окно по времени, не меняется и события о нем не бывает.
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        relevant: Callable[[Match], bool],
+        max_per_user: int = 3,
+        heartbeat: float = 15.0,
+        queue_size: int = 100,
+    ):
+        self.bus = bus
+        self.relevant = relevant
+        self.max_per_user = max_per_user
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self._connections: Dict[int, int] = {}
+        self._queues: "weakref.WeakSet[asyncio.Queue]" = weakref.WeakSet()
+        self.stats = {"opened": 0, "rejected": 0, "updates": 0, "heartbeats": 0}
+
+    def can_open(self, user_id: int) -> bool:
+        return self._connections.get(user_id, 0) < self.max_per_user
+
+    def open(self) -> asyncio.Queue:
+        """Подписаться на изменения до чтения текущего списка, чтобы не потерять их в промежутке"""
+        queue = self.bus.open_queue(self.queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def discard(self, queue: asyncio.Queue):
+        self.bus.close_queue(queue)
+        self._queues.discard(queue)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, item: Any):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def on_snapshot(self, snapshot):
+        """Передать снимок соединениям для перепроверки окна (после DeltaEngine)"""
+        if snapshot.date != today_utc():
+            return
+        for queue in self._queues:
+            self._put(queue, snapshot.matches)
+
+    def _recheck(self, matches: List[Match], shown: Set[str]) -> List[Dict[str, Any]]:
+        today = today_utc()
+        selected = []
+        for match in matches:
+            key = match_key(match)
+            if key in shown:
+                # Завершенные остаются у клиента с итоговым счетом
+                if match.status != 'finished' and not self.relevant(match):
+                    shown.discard(key)
+                    selected.append(MatchEvent(REMOVED, today, key, match, match).to_payload())
+            elif self.relevant(match):
+                shown.add(key)
+                selected.append(MatchEvent(ADDED, today, key, match).to_payload())
+        return selected
+
+    def _select(self, events: List[MatchEvent], shown: Set[str]) -> List[Dict[str, Any]]:
+        today = today_utc()
+        selected = []
+        for event in events:
+            if event.date != today:
+                continue
+            if event.kind == REMOVED:
+                if event.key in shown:
+                    shown.discard(event.key)
+                    selected.append(event.to_payload())
+            elif event.key in shown or self.relevant(event.match):
+                shown.add(event.key)
+                selected.append(event.to_payload())
+        return selected
+
+    async def stream(self, user_id: int, queue: asyncio.Queue, initial: List[Match]) -> AsyncIterator[str]:
+        """Текущий список, затем пачки изменений и heartbeat-комментарии.
+
+        queue — из open(), открытая до чтения initial.
+        """
+        # Лимит проверяется еще раз здесь: соединение считается открытым,
+        # только когда клиент начал читать поток
+        if not self.can_open(user_id):
+            self.discard(queue)
+            self.stats["rejected"] += 1
+            yield sse("rejected", {"error": "Слишком много открытых соединений"})
+            return
+        self._connections[user_id] = self._connections.get(user_id, 0) + 1
+        self.stats["opened"] += 1
+        try:
+            shown = {match_key(m) for m in initial}
+            yield f"retry: {RETRY_MS}\n\n"
+            yield sse("snapshot", {"matches": [{"key": match_key(m), "match": m.raw} for m in initial]})
+            while True:
+                try:
+                    item: Union[List[MatchEvent], List[Match], None] = await asyncio.wait_for(
+                        queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    self.stats["heartbeats"] += 1
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    return
+                if item and isinstance(item[0], MatchEvent):
+                    selected = self._select(item, shown)
+                else:
+                    selected = self._recheck(item, shown)
+                if selected:
+                    self.stats["updates"] += 1
+                    yield sse("update", {"events": selected})
+        finally:
+            self.discard(queue)
+            left = self._connections.get(user_id, 1) - 1
+            if left > 0:
+                self._connections[user_id] = left
+            else:
+                self._connections.pop(user_id, None)
+
+    def close(self):
+        """Завершить все потоки (при остановке сервиса)"""
+        for queue in self._queues:
+            self._put(queue, None)
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["connections"] = sum(self._connections.values())
+        stats["users"] = len(self._connections)
+        return stats
@@ -1,32 +1,139 @@
 import os
 import logging
-import threading
+import signal
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 import hmac
-import hashlib
 import json
 import random
+import re
 from typing import Dict, List, Optional
 
-import requests
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import uvicorn
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from api_sport import ApiSportClient, ApiSportError, CircuitBreaker, QuotaBudget
+from cache import TTLCache
+from callbacks import CallbackRouter, RouteMiddleware, pack
+from http_client import HttpClient
+from lifecycle import ApiServer, InFlightTracker
+from live_events import DeltaEngine, EventBus
+from live_feed import LiveFeed
+from match_service import Match, MatchService, now_ms
+from match_store import match_key
+from metrics import (CONTENT_TYPE, REGISTRY, Counter, Gauge, HandlerTimer, Histogram, LoopLagMonitor,
+                     RequestTimer, from_stats)
+from notifications import NotificationScheduler, SubscriberIndex
+from pagination import MatchPages, ResultSet
+from prefetcher import FixturePrefetcher
+from sender import SendQueue, consume_result
+from payloads import PayloadRegistry
+from rendering import RenderCache
+from static import StaticAssets
+from storage import DEFAULT_DB_PATH, SQLiteBackend, UserRepository
+from team_index import TEAM_ALIASES, TeamIndex
+from throttling import ThrottlingMiddleware
+from tracing import TraceMiddleware, TraceRequests, Tracer, span
+from profiling import MODES, Profiler, ProfilerBusy
+from webapp_auth import InitDataValidator
+
 # --- ПЕРЕМЕННЫЕ ОКРУЖЕНИЯ ---
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_SPORT_KEY = os.getenv("API_SPORT_KEY")
+# Адрес Bot API (по умолчанию api.telegram.org): локальный Bot API сервер или фейк для нагрузочных тестов
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "").strip().rstrip("/")
 WEBAPP_URL = os.getenv("WEBAPP_URL", "").strip()
+# Максимальный возраст initData Mini App в секундах (0 — без ограничения)
+WEBAPP_INIT_DATA_MAX_AGE = float(os.getenv("WEBAPP_INIT_DATA_MAX_AGE", "86400"))
+# Cache-Control max-age для статистики и турнирных таблиц
+STATIC_API_MAX_AGE = int(os.getenv("STATIC_API_MAX_AGE", "300"))
+
+# Пул исходящих HTTP-соединений
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+# API-Sport: адрес (можно направить на локальный фейковый сервер), повторы,
+# circuit breaker и бюджет запросов платного тарифа (0 — без лимита)
+API_SPORT_BASE_URL = os.getenv("API_SPORT_BASE_URL", "https://api.api-sport.ru/v1/football")
+API_SPORT_MAX_RETRIES = int(os.getenv("API_SPORT_MAX_RETRIES", "2"))
+API_SPORT_BREAKER_THRESHOLD = int(os.getenv("API_SPORT_BREAKER_THRESHOLD", "5"))
+API_SPORT_BREAKER_RESET = float(os.getenv("API_SPORT_BREAKER_RESET", "30"))
+API_SPORT_QUOTA_PER_MINUTE = int(os.getenv("API_SPORT_QUOTA_PER_MINUTE", "0"))
+API_SPORT_QUOTA_PER_DAY = int(os.getenv("API_SPORT_QUOTA_PER_DAY", "0"))
+
+# TTL кэша матчей в секундах: live-данные устаревают быстро, расписание — медленно
+MATCHES_CACHE_TTL_LIVE = float(os.getenv("MATCHES_CACHE_TTL_LIVE", "15"))
+MATCHES_CACHE_TTL_DEFAULT = float(os.getenv("MATCHES_CACHE_TTL_DEFAULT", "300"))
+
+# Интервалы фонового обновления матчей в секундах
+PREFETCH_LIVE_INTERVAL = float(os.getenv("PREFETCH_LIVE_INTERVAL", "5"))
+PREFETCH_IDLE_INTERVAL = float(os.getenv("PREFETCH_IDLE_INTERVAL", "180"))
+PREFETCH_TOMORROW = os.getenv("PREFETCH_TOMORROW", "0") == "1"
+
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").strip().rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Хранилище пользовательских данных
+DB_PATH = os.getenv("DB_PATH", str(DEFAULT_DB_PATH))
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "2"))
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "100"))
+
+# Лимиты исходящих сообщений Telegram и уведомления
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_PER_CHAT_RATE = float(os.getenv("SEND_PER_CHAT_RATE", "1"))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "4"))
+NOTIFY_KICKOFF_LEAD_MINUTES = float(os.getenv("NOTIFY_KICKOFF_LEAD_MINUTES", "15"))
+# Рассылать уведомления должен ровно один процесс, иначе каждый подписчик получит копию от каждого
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "1") == "1"
+# Списки матчей: сколько карточек на странице и сколько хранить список для листания
+MATCH_PAGE_SIZE = int(os.getenv("MATCH_PAGE_SIZE", "5"))
+MATCH_PAGES_TTL = float(os.getenv("MATCH_PAGES_TTL", "900"))
+# Сколько списков держать одновременно: не меньше, чем списков выдается за MATCH_PAGES_TTL
+# в пик (20000 ≈ 22 списка/с за 15 минут). Список хранит ссылки на общие Match, а не копии
+MATCH_PAGES_MAX = int(os.getenv("MATCH_PAGES_MAX", "20000"))
+# Сколько готовых карточек матчей держать в памяти
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "4096"))
+# Inline-режим: результатов на страницу и сколько Telegram кэширует ответ (с)
+INLINE_PAGE_SIZE = int(os.getenv("INLINE_PAGE_SIZE", "20"))
+INLINE_CACHE_TIME_LIVE = int(os.getenv("INLINE_CACHE_TIME_LIVE", "5"))
+INLINE_CACHE_TIME_UPCOMING = int(os.getenv("INLINE_CACHE_TIME_UPCOMING", "30"))
+INLINE_CACHE_TIME_TEAM = int(os.getenv("INLINE_CACHE_TIME_TEAM", "60"))
+
+# Сколько секунд ждать текущие обработчики при остановке (SIGTERM)
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "20"))
+# Лимит действий пользователя: в среднем THROTTLE_RATE в секунду, пачкой до THROTTLE_BURST;
+# повтор той же кнопки в течение THROTTLE_DUPLICATE_WINDOW секунд игнорируется
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_DUPLICATE_WINDOW = float(os.getenv("THROTTLE_DUPLICATE_WINDOW", "1"))
+# Поток обновлений Mini App: соединений на пользователя и период heartbeat (с)
+LIVE_FEED_MAX_PER_USER = int(os.getenv("LIVE_FEED_MAX_PER_USER", "3"))
+LIVE_FEED_HEARTBEAT = float(os.getenv("LIVE_FEED_HEARTBEAT", "15"))
+# Запросы дольше TRACE_SLOW_MS пишутся в лог деревом спанов (0 — трассировка выключена)
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+# Токен для /admin/*; без него админские эндпоинты выключены
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
 
 if not TELEGRAM_BOT_TOKEN:
     raise RuntimeError("TELEGRAM_BOT_TOKEN обязателен")
 if not API_SPORT_KEY:
     raise RuntimeError("API_SPORT_KEY обязателен")
+if BOT_MODE not in ("polling", "webhook"):
+    raise RuntimeError("BOT_MODE должен быть polling или webhook")
+if BOT_MODE == "webhook" and not (WEBHOOK_BASE_URL and WEBHOOK_SECRET):
+    raise RuntimeError("Для BOT_MODE=webhook обязательны WEBHOOK_BASE_URL и WEBHOOK_SECRET")
 
 # --- НАСТРОЙКА ЛОГИРОВАНИЯ ---
 logging.basicConfig(
@@ -35,14 +142,149 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
+if TELEGRAM_API_BASE:
+    bot = Bot(token=TELEGRAM_BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_BASE)))
+else:
+    bot = Bot(token=TELEGRAM_BOT_TOKEN)
 dp = Dispatcher()
+inflight = InFlightTracker()
+dp.update.outer_middleware(inflight)
+throttling = ThrottlingMiddleware(
+    rate=THROTTLE_RATE,
+    burst=THROTTLE_BURST,
+    duplicate_window=THROTTLE_DUPLICATE_WINDOW,
+)
+dp.message.outer_middleware(throttling)
+dp.callback_query.outer_middleware(throttling)
+# Все inline-кнопки обрабатываются одним хендлером через словарь маршрутов
+callback_router = CallbackRouter()
+# Маршрут кнопки ищется один раз: его берут метрики, трассировка и process_callback
+dp.callback_query.middleware(RouteMiddleware(callback_router))
+# Время обработчиков; для кнопок — по обработчику маршрута, а не общему process_callback
+handler_seconds = Histogram("bot_handler_seconds", "Время обработчиков aiogram", ("handler",))
+handler_errors = Counter("bot_handler_errors_total", "Исключения в обработчиках aiogram", ("handler",))
+dp.message.middleware(HandlerTimer(handler_seconds, handler_errors))
+dp.callback_query.middleware(HandlerTimer(handler_seconds, handler_errors, name=callback_router.handler_name))
+dp.inline_query.middleware(HandlerTimer(handler_seconds, handler_errors))
+tracer = Tracer(TRACE_SLOW_MS)
+dp.message.middleware(TraceMiddleware(tracer))
+dp.callback_query.middleware(TraceMiddleware(tracer, name=callback_router.handler_name))
+dp.inline_query.middleware(TraceMiddleware(tracer))
+http_client = HttpClient(
+    limit=HTTP_POOL_LIMIT,
+    limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+    timeout=HTTP_TIMEOUT,
+)
+
 app = FastAPI()
+app.add_middleware(RequestTimer, latency=Histogram(
+    "http_request_seconds", "Время ответа FastAPI до заголовков", ("method", "route", "status")))
+app.add_middleware(TraceRequests, tracer=tracer)
+
+# --- API-SPORT ---
+api_sport = ApiSportClient(
+    http_client,
+    API_SPORT_KEY,
+    base_url=API_SPORT_BASE_URL,
+    max_retries=API_SPORT_MAX_RETRIES,
+    breaker=CircuitBreaker(API_SPORT_BREAKER_THRESHOLD, API_SPORT_BREAKER_RESET),
+    budget=QuotaBudget(API_SPORT_QUOTA_PER_MINUTE, API_SPORT_QUOTA_PER_DAY),
+)
+
+# --- КЭШ ЗАПРОСОВ К API-SPORT ---
+matches_cache = TTLCache(default_ttl=MATCHES_CACHE_TTL_DEFAULT)
+
+def matches_cache_ttl(status=None) -> float:
+    ttl = MATCHES_CACHE_TTL_LIVE if status == 'inprogress' else MATCHES_CACHE_TTL_DEFAULT
+    # Когда квота на исходе, данные живут в кэше дольше
+    return ttl * api_sport.budget.ttl_factor()
+
+async def fetch_matches(date, status=None, tournament_id=None, team_id=None) -> List[Dict]:
+    """Список матчей из API-Sport через общий кэш.
+
+    Одновременные запросы с одинаковыми параметрами объединяются в один.
+    """
+    key = (date, status, tournament_id, team_id)
+    return await matches_cache.get_or_load(
+        key, lambda: api_sport.matches(date, status, tournament_id, team_id), ttl=matches_cache_ttl(status)
+    )
+
+prefetcher = FixturePrefetcher(
+    api_sport.matches,
+    live_interval=PREFETCH_LIVE_INTERVAL,
+    idle_interval=PREFETCH_IDLE_INTERVAL,
+    include_tomorrow=PREFETCH_TOMORROW,
+    interval_scale=api_sport.budget.ttl_factor,
+)
+match_service = MatchService(fetch_matches, snapshots=prefetcher.snapshot)
+prefetcher.add_listener(match_service.on_snapshot)
+
+# --- LIVE-СОБЫТИЯ ---
+# Снимок сравнивается с предыдущим один раз; потребители получают только изменения
+event_bus = EventBus()
+live_events = DeltaEngine(event_bus)
+prefetcher.add_listener(live_events.on_snapshot)
+
+def live_feed_relevant(match: Match) -> bool:
+    """Те же матчи, что и в /api/matches, плюс идущие сейчас"""
+    if match.status == 'inprogress':
+        return True
+    now = now_ms()
+    return match.status == 'notstarted' and bool(match.start_timestamp) and now <= match.start_timestamp <= now + 2 * 3600 * 1000
+
+live_feed = LiveFeed(
+    event_bus,
+    live_feed_relevant,
+    max_per_user=LIVE_FEED_MAX_PER_USER,
+    heartbeat=LIVE_FEED_HEARTBEAT,
+)
+# После DeltaEngine: окно «ближайших 2 часов» сдвигается без событий, его проверяет сам поток
+prefetcher.add_listener(live_feed.on_snapshot)
 
 # --- ХРАНИЛИЩА ДАННЫХ ---
-user_favorites: Dict[int, List[str]] = {}
-user_notifications: Dict[int, bool] = {}
-user_settings: Dict[int, Dict] = {}
+# Избранное, уведомления и настройки пользователей (SQLite в режиме WAL)
+users = UserRepository(
+    SQLiteBackend(DB_PATH),
+    flush_interval=STORAGE_FLUSH_INTERVAL,
+    batch_size=STORAGE_BATCH_SIZE,
+)
+
+# --- ОЧЕРЕДЬ ОТПРАВКИ ---
+# Все исходящие сообщения идут через одну очередь с лимитами Telegram
+send_queue = SendQueue(
+    bot,
+    global_rate=SEND_GLOBAL_RATE,
+    per_chat_rate=SEND_PER_CHAT_RATE,
+    workers=SEND_WORKERS,
+)
+
+def reply(message: types.Message, text: str, **kwargs) -> asyncio.Future:
+    """Ответ в чат сообщения через очередь отправки.
+
+    Не блокирует обработчик: ответы одного вызова обработчика (каждый
+    апдейт обрабатывается своей задачей), поставленные подряд, уходят
+    одним сообщением. Ответы на разные команды не склеиваются.
+    Дождаться отправки можно через возвращаемый future.
+    """
+    with span("telegram.submit", chars=len(text)):
+        future = send_queue.submit(message.chat.id, text, group=asyncio.current_task(), **kwargs)
+    future.add_done_callback(consume_result)
+    return future
+
+# --- УВЕДОМЛЕНИЯ ---
+# team_index объявлен ниже, в разделе поиска команд
+subscribers = SubscriberIndex(lambda name, team_id: team_index.keys_for(name, team_id))
+notifier = NotificationScheduler(
+    subscribers,
+    send_queue,
+    is_enabled=users.get_notifications,
+    kickoff_lead_minutes=NOTIFY_KICKOFF_LEAD_MINUTES,
+)
+if NOTIFY_ENABLED:
+    prefetcher.add_listener(notifier.on_snapshot)
+    event_bus.subscribe(notifier.on_events)
+else:
+    log.info("🔕 Уведомления в этом процессе выключены (NOTIFY_ENABLED=0)")
 
 # --- ПРЕДОПРЕДЕЛЕННЫЕ ЛИГИ ---
 POPULAR_LEAGUES = {
@@ -106,48 +348,51 @@ LEAGUE_TABLES = {
     ]
 }
 
+TABLE_LEAGUE_NAMES = {
+    "premier_league": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига Англия",
+    "la_liga": "🇪🇸 Ла Лига Испания",
+    "serie_a": "🇮🇹 Серия А Италия",
+    "bundesliga": "🇩🇪 Бундеслига Германия"
+}
+
+# --- ПОИСК КОМАНД ---
+# Индекс названий: заготовленные данные + команды из каждого снимка матчей
+team_index = TeamIndex(TEAM_ALIASES)
+team_index.add_many(team["team"] for table in LEAGUE_TABLES.values() for team in table)
+team_index.add_many(player["team"] for players in STATS_DATA.values() for player in players)
+prefetcher.add_listener(team_index.on_snapshot)
+
+def escape_markdown(text: str) -> str:
+    """Экранирование текста пользователя для parse_mode="Markdown".
+    Внутри сущностей (*...*) экранирование не работает, поэтому такой
+    текст вставляется только вне их"""
+    return re.sub(r"([_*`\[])", r"\\\1", text)
+
+def format_team_suggestions(query: str) -> str:
+    hits = team_index.search(query)
+    query = escape_markdown(query)
+    if not hits:
+        return f"❌ *Команда не найдена:* «{query}»"
+    # Одноименные команды различаем по турниру
+    same = {hit.team.name for hit in hits if sum(h.team.name == hit.team.name for h in hits) > 1}
+    names = "\n".join(
+        f"• {escape_markdown(hit.team.name)}"
+        + (f" ({escape_markdown(hit.team.tournament)})" if hit.team.name in same and hit.team.tournament else "")
+        for hit in hits
+    )
+    return f"🤔 *Не нашел точного совпадения:* «{query}»\n\nВозможно, вы имели в виду:\n{names}"
+
 # --- ФУНКЦИЯ ДЛЯ РАНДОМНОЙ СТАВКИ ---
-def get_random_bet_match():
+async def get_random_bet_match():
     """Получение случайного матча для ставки в течение часа"""
     try:
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        params = {"date": today}
-        headers = {"Authorization": API_SPORT_KEY}
-        
-        url = "https://api.api-sport.ru/v1/football/matches"
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
-        
-        if resp.status_code != 200:
-            return None
-            
-        data = resp.json()
-        matches = data.get("matches", [])
-        
-        if not matches:
-            return None
-        
-        now_utc = datetime.utcnow()
-        now_msk = now_utc + timedelta(hours=3)
-        one_hour_later_msk = now_msk + timedelta(hours=1)
-        
-        eligible_matches = []
-        for match in matches:
-            start_timestamp = match.get("startTimestamp")
-            if start_timestamp:
-                start_time_utc = datetime.fromtimestamp(start_timestamp / 1000)
-                start_time_msk = start_time_utc + timedelta(hours=3)
-                
-                if now_msk <= start_time_msk <= one_hour_later_msk:
-                    eligible_matches.append(match)
-        
-        if not eligible_matches:
+        random_match = await match_service.random_upcoming(hours=1)
+        if not random_match:
             return None
         
-        random_match = random.choice(eligible_matches)
-        
         bet_options = [
-            {"type": "П1", "text": f"П1 - победа {random_match.get('homeTeam', {}).get('name', 'хозяев')}", "emoji": "🏠"},
-            {"type": "П2", "text": f"П2 - победа {random_match.get('awayTeam', {}).get('name', 'гостей')}", "emoji": "✈️"},
+            {"type": "П1", "text": f"П1 - победа {random_match.home_name}", "emoji": "🏠"},
+            {"type": "П2", "text": f"П2 - победа {random_match.away_name}", "emoji": "✈️"},
             {"type": "Х", "text": "Х - ничья", "emoji": "🤝"},
             {"type": "ТБ", "text": "ТБ 2.5 - тотал больше 2.5 голов", "emoji": "📈"},
             {"type": "ТМ", "text": "ТМ 2.5 - тотал меньше 2.5 голов", "emoji": "📉"},
@@ -184,200 +429,284 @@ def get_league_table(league_key):
     return LEAGUE_TABLES.get(league_key, [])
 
 # --- ПРОВЕРКА INITDATA ---
-def validate_init_data(init_data: str) -> bool:
-    try:
-        pairs = init_data.split('&')
-        data_dict = {}
-        hash_value = None
-        
-        for pair in pairs:
-            key, value = pair.split('=', 1)
-            if key == 'hash':
-                hash_value = value
-            else:
-                data_dict[key] = value
-        
-        if not hash_value:
-            return False
-        
-        check_string = '\n'.join([f"{k}={data_dict[k]}" for k in sorted(data_dict.keys())])
-        
-        secret_key = hmac.new(
-            key=b"WebAppData",
-            msg=TELEGRAM_BOT_TOKEN.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
-        
-        calculated_hash = hmac.new(
-            key=secret_key,
-            msg=check_string.encode(),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-        
-        return calculated_hash == hash_value
-    except Exception as e:
-        log.error(f"Ошибка проверки initData: {e}")
-        return False
+init_data_validator = InitDataValidator(TELEGRAM_BOT_TOKEN, max_age=WEBAPP_INIT_DATA_MAX_AGE)
 
 # --- СТАТИЧЕСКИЕ ФАЙЛЫ WEB APP ---
+static_assets = StaticAssets()
+static_assets.load()
+
 @app.get("/")
-def index():
-    return FileResponse("app/webapp/index.html")
+async def index(request: Request):
+    return static_assets.response("index.html", request)
 
 @app.get("/style.css")
-def style():
-    return FileResponse("app/webapp/style.css")
+async def style(request: Request):
+    return static_assets.response("style.css", request)
 
 @app.get("/app.js")
-def app_js():
-    return FileResponse("app/webapp/app.js")
+async def app_js(request: Request):
+    return static_assets.response("app.js", request)
+
+@app.get("/static/{name}")
+async def static_file(name: str, request: Request):
+    return static_assets.response(f"static/{name}", request)
 
 # --- API ДЛЯ СТАТИСТИКИ ---
+# Ответы сериализуются один раз; при изменении STATS_DATA или
+# LEAGUE_TABLES нужно вызвать build_static_payloads() и build_static_messages()
+static_payloads = PayloadRegistry(max_age=STATIC_API_MAX_AGE)
+
+def build_static_payloads():
+    static_payloads.set("scorers", {"data": get_top_scorers(10)})
+    static_payloads.set("assists", {"data": get_top_assists(10)})
+    static_payloads.set("discipline", {"data": get_discipline_stats(10)})
+    static_payloads.set("defense", {"data": get_defense_stats(10)})
+    for league_key in LEAGUE_TABLES:
+        static_payloads.set(f"table_{league_key}", {"data": get_league_table(league_key)})
+
+build_static_payloads()
+
 @app.get("/api/stats/scorers")
-def api_stats_scorers():
-    try:
-        scorers = get_top_scorers(10)
-        return JSONResponse(content={"data": scorers})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+async def api_stats_scorers(request: Request):
+    return static_payloads.get("scorers").response(request)
 
 @app.get("/api/stats/assists")
-def api_stats_assists():
-    try:
-        assists = get_top_assists(10)
-        return JSONResponse(content={"data": assists})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+async def api_stats_assists(request: Request):
+    return static_payloads.get("assists").response(request)
 
 @app.get("/api/stats/discipline")
-def api_stats_discipline():
-    try:
-        discipline = get_discipline_stats(10)
-        return JSONResponse(content={"data": discipline})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+async def api_stats_discipline(request: Request):
+    return static_payloads.get("discipline").response(request)
 
 @app.get("/api/stats/defense")
-def api_stats_defense():
-    try:
-        defense = get_defense_stats(10)
-        return JSONResponse(content={"data": defense})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+async def api_stats_defense(request: Request):
+    return static_payloads.get("defense").response(request)
+
+@app.get("/api/tables/{league_key}")
+async def api_league_table(league_key: str, request: Request):
+    payload = static_payloads.get(f"table_{league_key}")
+    if payload is None:
+        return JSONResponse(status_code=404, content={"error": "Таблица не найдена"})
+    return payload.response(request)
 
 # --- РАСШИРЕННАЯ ФУНКЦИЯ ДЛЯ ПОЛУЧЕНИЯ ДАННЫХ О МАТЧАХ ---
-def get_matches_data_extended(date=None, status=None, tournament_id=None, team_id=None):
+async def get_matches_data_extended(date=None, status=None, tournament_id=None, team_id=None):
     try:
-        if date is None:
-            date = datetime.utcnow().strftime("%Y-%m-%d")
-        
-        params = {"date": date}
-        
-        if status:
-            params["status"] = status
-        if tournament_id:
-            params["tournament_id"] = tournament_id
-        if team_id:
-            params["team_id"] = team_id
-        
-        headers = {"Authorization": API_SPORT_KEY}
-        url = "https://api.api-sport.ru/v1/football/matches"
-        
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
-        
-        if resp.status_code != 200:
-            return JSONResponse(
-                status_code=resp.status_code,
-                content={"error": f"Ошибка API: {resp.status_code}"}
-            )
-        
-        data = resp.json()
-        matches = data.get("matches", [])
-        
-        if status == 'inprogress':
-            filtered_matches = matches
-        else:
-            now_utc = datetime.utcnow()
-            now_msk = now_utc + timedelta(hours=3)
-            two_hours_later_msk = now_msk + timedelta(hours=2)
-            
-            filtered_matches = []
-            for match in matches:
-                start_timestamp = match.get("startTimestamp")
-                if start_timestamp:
-                    start_time_utc = datetime.fromtimestamp(start_timestamp / 1000)
-                    start_time_msk = start_time_utc + timedelta(hours=3)
-                    
-                    if now_msk <= start_time_msk <= two_hours_later_msk:
-                        filtered_matches.append(match)
-        
-        return JSONResponse(content={
-            "data": filtered_matches,
-            "total": len(filtered_matches),
-            "today_total": len(matches)
-        })
-        
+        with span("matches.query"):
+            result = await match_service.query(date, status, tournament_id, team_id)
+        with span("json.encode", matches=len(result)):
+            return JSONResponse(content=result.to_payload())
+    except ApiSportError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"error": str(e)}
+        )
     except Exception as e:
         log.exception("Ошибка в get_matches_data_extended")
         return JSONResponse(status_code=500, content={"error": f"Внутренняя ошибка: {str(e)}"})
 
-def get_matches_data():
-    return get_matches_data_extended()
+async def get_matches_data():
+    return await get_matches_data_extended()
 
 # --- API ENDPOINTS ---
 @app.get("/api/matches")
-def api_matches(request: Request):
+async def api_matches(request: Request):
     try:
-        init_data = request.headers.get("X-Telegram-Init-Data")
-        if not init_data or not validate_init_data(init_data):
+        auth = init_data_validator.validate(request.headers.get("X-Telegram-Init-Data", ""))
+        if auth is None:
             return JSONResponse(status_code=401, content={"error": "Неверный initData"})
-        return get_matches_data_extended()
+        return await get_matches_data_extended()
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/api/matches/stream")
+async def api_matches_stream(request: Request):
+    """SSE: текущий список матчей, затем только изменения.
+
+    initData приходит в заголовке, как в /api/matches: в query он попал
+    бы в access log. Mini App читает поток через fetch, а не EventSource.
+    """
+    auth = init_data_validator.validate(request.headers.get("X-Telegram-Init-Data", ""))
+    if auth is None or auth.user_id is None:
+        return JSONResponse(status_code=401, content={"error": "Неверный initData"})
+    if not live_feed.can_open(auth.user_id):
+        return JSONResponse(status_code=429, content={"error": "Слишком много открытых соединений"})
+    queue = live_feed.open()
+    try:
+        live = await match_service.live()
+        upcoming = await match_service.upcoming()
+    except ApiSportError as e:
+        live_feed.discard(queue)
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    live_keys = {match_key(m) for m in live.matches}
+    initial = live.matches + [m for m in upcoming.matches if match_key(m) not in live_keys]
+    return StreamingResponse(
+        live_feed.stream(auth.user_id, queue, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/internal/matches")
-def api_internal_matches():
+async def api_internal_matches():
     try:
-        return get_matches_data_extended()
+        return await get_matches_data_extended()
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/api/internal/matches/live")
-def api_internal_matches_live():
+async def api_internal_matches_live():
     try:
-        return get_matches_data_extended(status='inprogress')
+        return await get_matches_data_extended(status='inprogress')
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/api/internal/matches/league/{league_id}")
-def api_internal_matches_league(league_id: int):
+async def api_internal_matches_league(league_id: int):
     try:
-        return get_matches_data_extended(tournament_id=league_id)
+        result = await match_service.by_league(league_id)
+        return JSONResponse(content=result.to_payload())
+    except ApiSportError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+# --- WEBHOOK TELEGRAM ---
+# Задачи обработки апдейтов: держим ссылки, чтобы их не собрал GC и
+# чтобы дождаться их при остановке
+webhook_tasks: set = set()
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    if BOT_MODE != "webhook":
+        return JSONResponse(status_code=404, content={"error": "Not Found"})
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+        return JSONResponse(status_code=401, content={"error": "Неверный secret token"})
+    try:
+        update = types.Update.model_validate(await request.json(), context={"bot": bot})
+    except Exception as e:
+        log.warning(f"Некорректный апдейт в webhook: {e}")
+        return JSONResponse(status_code=400, content={"error": "Некорректный апдейт"})
+    # Отвечаем Telegram сразу, обработка идет в фоне
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    webhook_tasks.add(task)
+    task.add_done_callback(webhook_tasks.discard)
+    return JSONResponse(content={"ok": True})
+
+@app.get("/api/internal/cache/stats")
+def api_internal_cache_stats():
+    return JSONResponse(content={
+        "matches": matches_cache.snapshot_stats(),
+        "match_cards": match_cards.snapshot_stats(),
+        "match_pages": match_pages.snapshot_stats(),
+        "api_sport": api_sport.snapshot_stats(),
+        "live_events": {**event_bus.stats, "subscribers": event_bus.subscribers},
+    })
+
+@app.get("/api/internal/send/stats")
+def api_internal_send_stats():
+    return JSONResponse(content=send_queue.snapshot_stats())
+
+@app.get("/api/internal/throttle/stats")
+def api_internal_throttle_stats():
+    return JSONResponse(content=throttling.snapshot_stats())
+
+@app.get("/api/internal/feed/stats")
+def api_internal_feed_stats():
+    return JSONResponse(content=live_feed.snapshot_stats())
+
+# --- МЕТРИКИ ---
+# Счетчики из stats компонентов читаются только при запросе /metrics
+def circuit_state():
+    return {(state,): int(api_sport.breaker.state == state) for state in ("closed", "open", "half_open")}
+
+def cache_hit_ratios():
+    return {(name,): cache.snapshot_stats()["hit_ratio"] for name, cache in
+            (("matches", matches_cache), ("match_cards", match_cards))}
+
+Counter("api_sport_rejected_total", "Запросы к API-Sport, не отправленные провайдеру", ("reason",),
+        collect=lambda: {("circuit_open",): api_sport.stats["rejected_open"],
+                         ("quota",): api_sport.stats["rejected_quota"]})
+Gauge("api_sport_circuit_state", "Состояние circuit breaker API-Sport", ("state",), collect=circuit_state)
+Gauge("api_sport_quota_remaining_ratio", "Доля оставшейся квоты API-Sport",
+      collect=lambda: {(): api_sport.budget.remaining_ratio()})
+Gauge("cache_hit_ratio", "Доля попаданий в кэш", ("cache",), collect=cache_hit_ratios)
+Counter("match_pages_dropped_total", "Удаленные списки для листания; evicted — вытеснены по MATCH_PAGES_MAX",
+        ("reason",), collect=from_stats(lambda: match_pages.snapshot_stats(), ("expired", "evicted")))
+Counter("telegram_send_total", "Исходящие сообщения Telegram по результату", ("result",),
+        collect=from_stats(send_queue.snapshot_stats, ("sent", "errors", "retry_after", "coalesced")))
+Gauge("telegram_send_queue_depth", "Сообщений в очереди отправки",
+      collect=lambda: {(): send_queue.depth()})
+Counter("bot_throttle_total", "Действия пользователей по решению троттлинга", ("result",),
+        collect=from_stats(throttling.snapshot_stats, ("passed", "attached", "duplicates", "throttled")))
+Counter("traces_total", "Трассировки запросов; slow — дольше TRACE_SLOW_MS", ("result",),
+        collect=from_stats(lambda: tracer.stats, ("traces", "slow")))
+Gauge("live_feed_connections", "Открытые SSE-потоки Mini App",
+      collect=lambda: {(): live_feed.snapshot_stats()["connections"]})
+loop_lag = LoopLagMonitor(Histogram(
+    "event_loop_lag_seconds", "Задержка пробуждения event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# --- АДМИНИСТРИРОВАНИЕ ---
+profiler = Profiler(max_seconds=PROFILE_MAX_SECONDS)
+
+def admin_allowed(request: Request) -> bool:
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.post("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10, mode: str = "sample", limit: int = 40):
+    """Профиль процесса за seconds секунд: mode=cprofile или sample"""
+    if not admin_allowed(request):
+        return JSONResponse(status_code=403, content={"error": "Доступ запрещен"})
+    if mode not in MODES:
+        return JSONResponse(status_code=400, content={"error": f"mode: {', '.join(MODES)}"})
+    log.info(f"🔬 Профилирование {mode} на {seconds} с")
+    try:
+        return PlainTextResponse(await profiler.run(mode, seconds, limit))
+    except ProfilerBusy as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+
 # --- УЛУЧШЕННЫЙ ВИЗУАЛ - ФУНКЦИИ ФОРМАТИРОВАНИЯ ---
-def format_match_message(match_data, is_live=False):
+# Увеличить при любом изменении шаблона карточки матча
+MATCH_CARD_VERSION = 1
+match_cards = RenderCache(max_entries=RENDER_CACHE_SIZE)
+
+def start_time_emoji(match: Match) -> str:
+    """Эмодзи для времени до матча"""
+    if not match.start_timestamp:
+        return "🕒"
+    minutes_left = (match.start_timestamp - now_ms()) / 60000
+    if minutes_left < 30:
+        return "🔜"
+    if minutes_left < 60:
+        return "⏳"
+    return "🕒"
+
+def format_match_message(match: Match, is_live=False):
+    """Карточка матча из кэша; собирается заново только при изменении матча"""
+    emoji = "" if is_live else start_time_emoji(match)
+    key = (match_key(match), match.status, match.home_score, match.away_score, match.start_timestamp,
+           match.home_name, match.away_name, match.tournament_name, is_live, emoji, MATCH_CARD_VERSION)
+    with span("format.match"):
+        return match_cards.get_or_render(key, lambda: render_match_message(match, is_live, emoji))
+
+def render_match_message(match: Match, is_live: bool, time_emoji: str):
     """Форматирование сообщения о матче с улучшенным визуалом"""
-    tournament = match_data.get("tournament", {})
-    league = tournament.get("name", "—")
-    
-    home_team = match_data.get("homeTeam", {})
-    away_team = match_data.get("awayTeam", {})
-    home_name = home_team.get("name", "Home")
-    away_name = away_team.get("name", "Away")
+    league = match.tournament_name
+    home_name = match.home_name
+    away_name = match.away_name
     
-    start_timestamp = match_data.get("startTimestamp")
-    if start_timestamp:
-        start_time_utc = datetime.fromtimestamp(start_timestamp / 1000)
-        start_time_msk = start_time_utc + timedelta(hours=3)
-        time_str = start_time_msk.strftime("%H:%M МСК")
-    else:
-        time_str = "—"
+    start_time_msk = match.start_time_msk
+    time_str = start_time_msk.strftime("%H:%M МСК") if start_time_msk else "—"
     
     if is_live:
-        home_score = match_data.get("homeScore", {}).get("current", 0)
-        away_score = match_data.get("awayScore", {}).get("current", 0)
+        home_score = match.home_score
+        away_score = match.away_score
         
         # Эмодзи для статуса матча
         status_emoji = "🔴"
@@ -396,15 +725,6 @@ def format_match_message(match_data, is_live=False):
             f"🎯 *Статус:* Матч в процессе"
         )
     else:
-        # Эмодзи для времени до матча
-        time_emoji = "🕒"
-        if start_timestamp:
-            time_diff = (start_time_msk - (datetime.utcnow() + timedelta(hours=3))).total_seconds() / 60
-            if time_diff < 30:
-                time_emoji = "🔜"
-            elif time_diff < 60:
-                time_emoji = "⏳"
-        
         return (
             f"⚽ *{league}*\n"
             f"────────────────\n"
@@ -435,9 +755,12 @@ def format_stats_message(stats_type, data):
         elif stats_type == "defense":
             text += f"{i}. {emoji} *{player['name']}* ({player['team']})\n   🧤 Сухие матчи: {player['clean_sheets']}\n\n"
     
-    text += f"📅 *Обновлено:* {datetime.now().strftime('%d.%m.%Y %H:%M')}"
     return text
 
+def format_updated() -> str:
+    """Строка времени обновления: добавляется к готовому тексту при каждом ответе"""
+    return f"📅 *Обновлено:* {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+
 def format_table_message(league_name, table_data):
     """Форматирование турнирной таблицы с улучшенным визуалом"""
     position_emojis = {1: "🥇", 2: "🥈", 3: "🥉", 4: "4️⃣", 5: "5️⃣"}
@@ -463,26 +786,57 @@ def format_table_message(league_name, table_data):
     
     return text
 
+# Статистика и таблицы одинаковы для всех: тексты собираются при изменении данных,
+# время обновления подставляется при ответе
+static_messages: Dict[str, str] = {}
+
+def build_static_messages():
+    static_messages["stats_scorers"] = format_stats_message("scorers", get_top_scorers(5))
+    static_messages["stats_assists"] = format_stats_message("assists", get_top_assists(5))
+    static_messages["stats_discipline"] = format_stats_message("discipline", get_discipline_stats(5))
+    static_messages["stats_defense"] = format_stats_message("defense", get_defense_stats(5))
+    for league_key, league_name in TABLE_LEAGUE_NAMES.items():
+        table_data = get_league_table(league_key)
+        if table_data:
+            static_messages[f"table_{league_key}"] = format_table_message(league_name, table_data)
+
+build_static_messages()
+
+# --- ПОСТРАНИЧНЫЕ СПИСКИ МАТЧЕЙ ---
+match_pages = MatchPages(
+    lambda m, is_live: format_match_message(m, is_live=is_live),
+    page_size=MATCH_PAGE_SIZE,
+    ttl=MATCH_PAGES_TTL,
+    max_entries=MATCH_PAGES_MAX,
+)
+
+def reply_match_list(message: types.Message, title: str, matches: List[Match], is_live=False):
+    """Первая страница списка одним сообщением с кнопками листания"""
+    token = match_pages.store(ResultSet(title, matches, is_live))
+    with span("format.page", matches=len(matches)):
+        text, markup = match_pages.render(token)
+    reply(message, text, reply_markup=markup, parse_mode="Markdown")
+
 # --- ОСНОВНЫЕ ОБРАБОТЧИКИ TELEGRAM ---
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
     kb = InlineKeyboardBuilder()
     
     # Первый ряд - основные функции
-    kb.button(text="📅 Ближайшие матчи", callback_data="get_matches")
-    kb.button(text="📡 Live-матчи", callback_data="get_live")
+    kb.button(text="📅 Ближайшие матчи", callback_data=pack("um"))
+    kb.button(text="📡 Live-матчи", callback_data=pack("lv"))
     
     # Второй ряд - развлечения и аналитика
-    kb.button(text="🎲 Рандомная ставка", callback_data="random_bet")
-    kb.button(text="🏆 Выбор лиги", callback_data="select_league")
+    kb.button(text="🎲 Рандомная ставка", callback_data=pack("bt"))
+    kb.button(text="🏆 Выбор лиги", callback_data=pack("lm"))
     
     # Третий ряд - статистика
-    kb.button(text="📊 Турнирные таблицы", callback_data="tables_menu")
-    kb.button(text="📈 Статистика игроков", callback_data="stats_menu")
+    kb.button(text="📊 Турнирные таблицы", callback_data=pack("tm"))
+    kb.button(text="📈 Статистика игроков", callback_data=pack("sm"))
     
     # Четвертый ряд - персонализация
-    kb.button(text="⭐ Избранное", callback_data="favorites_menu")
-    kb.button(text="⚙️ Настройки", callback_data="settings_menu")
+    kb.button(text="⭐ Избранное", callback_data=pack("fm"))
+    kb.button(text="⚙️ Настройки", callback_data=pack("st"))
     
     kb.adjust(2, 2, 2, 2)
     
@@ -500,45 +854,45 @@ async def cmd_start(message: types.Message):
         "👇 Выберите действие ниже или используйте команды:"
     )
     
-    await message.answer(welcome_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
+    reply(message, welcome_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
 
 # --- ОБРАБОТЧИКИ КНОПОК ГЛАВНОГО МЕНЮ ---
-@dp.callback_query(lambda c: c.data == "get_matches")
+@callback_router.route("um", legacy=["get_matches"])
 async def process_get_matches(callback: types.CallbackQuery):
     await callback.answer("⏳ Загружаю матчи...")
     await cmd_matches(callback.message)
 
-@dp.callback_query(lambda c: c.data == "get_live")
+@callback_router.route("lv", legacy=["get_live"])
 async def process_get_live(callback: types.CallbackQuery):
     await callback.answer("📡 Ищу live-матчи...")
     await cmd_live(callback.message)
 
-@dp.callback_query(lambda c: c.data == "random_bet")
+@callback_router.route("bt", legacy=["random_bet"])
 async def process_random_bet(callback: types.CallbackQuery):
     await callback.answer("🎲 Кручу барабан...")
     await cmd_bet(callback.message)
 
-@dp.callback_query(lambda c: c.data == "select_league")
+@callback_router.route("lm", legacy=["select_league"])
 async def process_select_league(callback: types.CallbackQuery):
     await callback.answer("🏆 Выбираю лиги...")
     await cmd_league(callback.message)
 
-@dp.callback_query(lambda c: c.data == "tables_menu")
+@callback_router.route("tm", legacy=["tables_menu"])
 async def process_tables_menu(callback: types.CallbackQuery):
     await callback.answer("📊 Загружаю таблицы...")
     await cmd_table(callback.message)
 
-@dp.callback_query(lambda c: c.data == "stats_menu")
+@callback_router.route("sm", legacy=["stats_menu"])
 async def process_stats_menu(callback: types.CallbackQuery):
     await callback.answer("📈 Открываю статистику...")
     await cmd_stats(callback.message)
 
-@dp.callback_query(lambda c: c.data == "favorites_menu")
+@callback_router.route("fm", legacy=["favorites_menu"])
 async def process_favorites_menu(callback: types.CallbackQuery):
     await callback.answer("⭐ Ваше избранное...")
     await cmd_favorite(callback.message)
 
-@dp.callback_query(lambda c: c.data == "settings_menu")
+@callback_router.route("st", legacy=["settings_menu"])
 async def process_settings_menu(callback: types.CallbackQuery):
     await callback.answer("⚙️ Настройки...")
     await cmd_notify(callback.message)
@@ -546,64 +900,37 @@ async def process_settings_menu(callback: types.CallbackQuery):
 # --- КОМАНДЫ БОТА ---
 @dp.message(Command("matches"))
 async def cmd_matches(message: types.Message):
-    await message.answer("🔍 *Ищу ближайшие матчи...*", parse_mode="Markdown")
-    
     try:
-        internal_url = "http://127.0.0.1:8080/api/internal/matches"
-        resp = requests.get(internal_url, timeout=10)
-        
-        if resp.status_code != 200:
-            await message.answer("❌ *Не удалось загрузить матчи*", parse_mode="Markdown")
+        try:
+            data = (await match_service.upcoming()).matches
+        except ApiSportError:
+            reply(message, "❌ *Не удалось загрузить матчи*", parse_mode="Markdown")
             return
-            
-        data = resp.json().get("data", [])
         
         if not data:
-            await message.answer(
+            reply(message,
                 "⚽ *Нет матчей в ближайшие 2 часа*\n\n"
                 "Попробуйте позже или посмотрите другие разделы!",
                 parse_mode="Markdown"
             )
             return
         
-        await message.answer(f"📅 *Найдено матчей: {len(data)}*", parse_mode="Markdown")
-        
-        for m in data[:5]:
-            match_text = format_match_message(m)
-            await message.answer(match_text, parse_mode="Markdown")
-            
-        if len(data) > 5:
-            kb = InlineKeyboardBuilder()
-            kb.button(text="📋 Показать все матчи", callback_data="show_all_matches")
-            kb.button(text="🔙 Главное меню", callback_data="main_menu")
-            kb.adjust(1)
-            
-            await message.answer(
-                f"📊 *Показано 5 из {len(data)} матчей*\n"
-                f"Для просмотра всех матчей используйте кнопку ниже:",
-                reply_markup=kb.as_markup(),
-                parse_mode="Markdown"
-            )
+        reply_match_list(message, "📅 *Ближайшие матчи*", data)
             
     except Exception as e:
-        await message.answer("❌ *Произошла ошибка при загрузке матчей*", parse_mode="Markdown")
+        reply(message, "❌ *Произошла ошибка при загрузке матчей*", parse_mode="Markdown")
 
 @dp.message(Command("live"))
 async def cmd_live(message: types.Message):
-    await message.answer("🔴 *Ищу активные матчи...*", parse_mode="Markdown")
-    
     try:
-        internal_url = "http://127.0.0.1:8080/api/internal/matches/live"
-        resp = requests.get(internal_url, timeout=10)
-        
-        if resp.status_code != 200:
-            await message.answer("❌ *Не удалось загрузить live-матчи*", parse_mode="Markdown")
+        try:
+            data = (await match_service.live()).matches
+        except ApiSportError:
+            reply(message, "❌ *Не удалось загрузить live-матчи*", parse_mode="Markdown")
             return
-            
-        data = resp.json().get("data", [])
         
         if not data:
-            await message.answer(
+            reply(message,
                 "🔴 *Сейчас нет активных матчей*\n\n"
                 "Но вы можете посмотреть:\n"
                 "• 📅 Ближайшие матчи\n"
@@ -613,48 +940,35 @@ async def cmd_live(message: types.Message):
             )
             return
         
-        await message.answer(f"🔴 *Активных матчей: {len(data)}*", parse_mode="Markdown")
-        
-        for m in data[:5]:
-            match_text = format_match_message(m, is_live=True)
-            await message.answer(match_text, parse_mode="Markdown")
+        reply_match_list(message, "🔴 *Активные матчи*", data, is_live=True)
             
     except Exception as e:
-        await message.answer("❌ *Произошла ошибка при загрузке live-матчей*", parse_mode="Markdown")
+        reply(message, "❌ *Произошла ошибка при загрузке live-матчей*", parse_mode="Markdown")
 
 @dp.message(Command("bet"))
 async def cmd_bet(message: types.Message):
-    await message.answer("🎰 *Кручу барабан... Ищу интересный матч для ставки!*", parse_mode="Markdown")
+    reply(message, "🎰 *Кручу барабан... Ищу интересный матч для ставки!*", parse_mode="Markdown")
     
-    bet_data = get_random_bet_match()
+    bet_data = await get_random_bet_match()
     
     if not bet_data:
-        await message.answer(
+        reply(message,
             "❌ *Не нашел подходящих матчей для ставки в ближайший час*\n\n"
             "💡 Попробуйте позже, когда будет больше матчей!",
             parse_mode="Markdown"
         )
         return
     
-    match_data = bet_data["match"]
+    match = bet_data["match"]
     bet = bet_data["bet"]
     confidence = bet_data["confidence"]
     
-    tournament = match_data.get("tournament", {})
-    league = tournament.get("name", "—")
-    
-    home_team = match_data.get("homeTeam", {})
-    away_team = match_data.get("awayTeam", {})
-    home_name = home_team.get("name", "Home")
-    away_name = away_team.get("name", "Away")
+    league = match.tournament_name
+    home_name = match.home_name
+    away_name = match.away_name
     
-    start_timestamp = match_data.get("startTimestamp")
-    if start_timestamp:
-        start_time_utc = datetime.fromtimestamp(start_timestamp / 1000)
-        start_time_msk = start_time_utc + timedelta(hours=3)
-        time_str = start_time_msk.strftime("%H:%M МСК")
-    else:
-        time_str = "—"
+    start_time_msk = match.start_time_msk
+    time_str = start_time_msk.strftime("%H:%M МСК") if start_time_msk else "—"
     
     # Улучшенные варианты ставок
     stake_options = [
@@ -689,24 +1003,24 @@ async def cmd_bet(message: types.Message):
     )
     
     kb = InlineKeyboardBuilder()
-    kb.button(text="🎲 Новая случайная ставка", callback_data="random_bet")
-    kb.button(text="📅 Все матчи", callback_data="get_matches")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="🎲 Новая случайная ставка", callback_data=pack("bt"))
+    kb.button(text="📅 Все матчи", callback_data=pack("um"))
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await message.answer(bet_message, reply_markup=kb.as_markup(), parse_mode="Markdown")
+    reply(message, bet_message, reply_markup=kb.as_markup(), parse_mode="Markdown")
 
 @dp.message(Command("league"))
 async def cmd_league(message: types.Message):
     kb = InlineKeyboardBuilder()
     
     for league_id, league_info in POPULAR_LEAGUES.items():
-        kb.button(text=f"{league_info['emoji']} {league_info['name']}", callback_data=f"league_{league_id}")
+        kb.button(text=f"{league_info['emoji']} {league_info['name']}", callback_data=pack("lg", league_id))
     
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(2)
     
-    await message.answer(
+    reply(message,
         "🏆 *Выберите лигу*\n\n"
         "👇 Показаны матчи на сегодня из выбранной лиги:",
         reply_markup=kb.as_markup(),
@@ -717,14 +1031,14 @@ async def cmd_league(message: types.Message):
 async def cmd_table(message: types.Message):
     kb = InlineKeyboardBuilder()
     
-    kb.button(text="🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига", callback_data="table_premier_league")
-    kb.button(text="🇪🇸 Ла Лига", callback_data="table_la_liga")
-    kb.button(text="🇮🇹 Серия А", callback_data="table_serie_a")
-    kb.button(text="🇩🇪 Бундеслига", callback_data="table_bundesliga")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига", callback_data=pack("tb", "premier_league"))
+    kb.button(text="🇪🇸 Ла Лига", callback_data=pack("tb", "la_liga"))
+    kb.button(text="🇮🇹 Серия А", callback_data=pack("tb", "serie_a"))
+    kb.button(text="🇩🇪 Бундеслига", callback_data=pack("tb", "bundesliga"))
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await message.answer(
+    reply(message,
         "📊 *Турнирные таблицы*\n\n"
         "👇 Выберите лигу для просмотра текущей таблицы:",
         reply_markup=kb.as_markup(),
@@ -735,23 +1049,33 @@ async def cmd_table(message: types.Message):
 async def cmd_team(message: types.Message):
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
-        await message.answer(
+        reply(message,
             "🔍 *Поиск матчей по команде*\n\n"
             "💡 *Использование:*\n"
             "`/team Реал Мадрид`\n"
-            "`/team Барселона`\n\n"
-            "🚧 *Функция в разработке*\n"
-            "Скоро вы сможете искать матчи по вашим любимым командам!",
+            "`/team Барселона`",
             parse_mode="Markdown"
         )
         return
     
-    await message.answer(
-        "🔍 *Поиск по командам*\n\n"
-        "🚧 *Функция в разработке*\n"
-        "Следите за обновлениями!",
-        parse_mode="Markdown"
-    )
+    team = team_index.resolve(args[1])
+    if team is None:
+        reply(message, format_team_suggestions(args[1]), parse_mode="Markdown")
+        return
+    if team.team_id is None:
+        reply(message, f"⚽ *{team.name}*\n\nСегодня матчей нет", parse_mode="Markdown")
+        return
+    
+    try:
+        data = (await match_service.by_team(team.team_id)).matches
+    except ApiSportError:
+        reply(message, "❌ *Не удалось загрузить матчи*", parse_mode="Markdown")
+        return
+    
+    if not data:
+        reply(message, f"⚽ *{team.name}*\n\nСегодня матчей нет", parse_mode="Markdown")
+        return
+    reply_match_list(message, f"⚽ *Матчи {team.name}*", data)
 
 @dp.message(Command("favorite"))
 async def cmd_favorite(message: types.Message):
@@ -759,10 +1083,10 @@ async def cmd_favorite(message: types.Message):
     args = message.text.split(maxsplit=1)
     
     if len(args) < 2:
-        favorites = user_favorites.get(user_id, [])
+        favorites = users.get_favorites(user_id)
         if favorites:
-            fav_text = "\n".join([f"⭐ {team}" for team in favorites])
-            await message.answer(
+            fav_text = "\n".join([f"⭐ {escape_markdown(team)}" for team in favorites])
+            reply(message,
                 f"⭐ *Ваши избранные команды*\n\n"
                 f"{fav_text}\n\n"
                 f"💡 Чтобы добавить команду:\n"
@@ -770,7 +1094,7 @@ async def cmd_favorite(message: types.Message):
                 parse_mode="Markdown"
             )
         else:
-            await message.answer(
+            reply(message,
                 "⭐ *Избранные команды*\n\n"
                 "У вас пока нет избранных команд.\n\n"
                 "💡 *Добавить команду:*\n"
@@ -780,45 +1104,59 @@ async def cmd_favorite(message: types.Message):
             )
         return
     
-    team_name = args[1]
-    if user_id not in user_favorites:
-        user_favorites[user_id] = []
-    
-    if team_name not in user_favorites[user_id]:
-        user_favorites[user_id].append(team_name)
-        await message.answer(
+    team = team_index.resolve(args[1])
+    if team is None:
+        reply(message, format_team_suggestions(args[1]), parse_mode="Markdown")
+        return
+    if team.team_id is None:
+        # Заготовленное название могло не совпасть с названием в матчах:
+        # подписка на него не получила бы ни одного уведомления
+        reply(message,
+            f"ℹ️ *Матчей этой команды пока нет в данных*\n\n"
+            f"⭐ {escape_markdown(team.name)}\n\n"
+            f"Добавить ее в избранное можно, когда появится ее матч",
+            parse_mode="Markdown"
+        )
+        return
+    # В избранное попадает название из данных, чтобы по нему находились матчи
+    team_name = team.name
+    if users.add_favorite(user_id, team_name):
+        subscribers.add(user_id, team_name)
+        reply(message,
             f"✅ *Команда добавлена в избранное*\n\n"
-            f"⭐ {team_name}\n\n"
-            f"Теперь вы будете получать уведомления о матчах этой команды!",
+            f"⭐ {escape_markdown(team_name)}\n\n"
+            + ("Теперь вы будете получать уведомления о матчах этой команды!"
+               if users.get_notifications(user_id) else
+               "🔔 Чтобы получать уведомления о ее матчах, включите их: /notify"),
             parse_mode="Markdown"
         )
     else:
-        await message.answer(
+        reply(message,
             f"ℹ️ *Команда уже в избранном*\n\n"
-            f"⭐ {team_name}",
+            f"⭐ {escape_markdown(team_name)}",
             parse_mode="Markdown"
         )
 
 @dp.message(Command("notify"))
 async def cmd_notify(message: types.Message):
     user_id = message.from_user.id
-    current_status = user_notifications.get(user_id, False)
+    current_status = users.get_notifications(user_id)
     
     kb = InlineKeyboardBuilder()
     
     if current_status:
-        kb.button(text="🔕 Выключить уведомления", callback_data="disable_notifications")
+        kb.button(text="🔕 Выключить уведомления", callback_data=pack("nd"))
         status_text = "✅ включены"
         status_emoji = "🔔"
     else:
-        kb.button(text="🔔 Включить уведомления", callback_data="enable_notifications")
+        kb.button(text="🔔 Включить уведомления", callback_data=pack("ne"))
         status_text = "🔕 выключены"
         status_emoji = "🔕"
     
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await message.answer(
+    reply(message,
         f"{status_emoji} *Управление уведомлениями*\n\n"
         f"📊 *Текущий статус:* {status_text}\n\n"
         f"📨 *Вы будете получать:*\n"
@@ -833,14 +1171,14 @@ async def cmd_notify(message: types.Message):
 async def cmd_stats(message: types.Message):
     kb = InlineKeyboardBuilder()
     
-    kb.button(text="🥅 Лучшие бомбардиры", callback_data="stats_scorers")
-    kb.button(text="🅰️ Лучшие ассистенты", callback_data="stats_assists")
-    kb.button(text="🟨🟥 Дисциплина", callback_data="stats_discipline")
-    kb.button(text="🧤 Лучшие вратари", callback_data="stats_defense")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="🥅 Лучшие бомбардиры", callback_data=pack("ss", "scorers"))
+    kb.button(text="🅰️ Лучшие ассистенты", callback_data=pack("ss", "assists"))
+    kb.button(text="🟨🟥 Дисциплина", callback_data=pack("ss", "discipline"))
+    kb.button(text="🧤 Лучшие вратари", callback_data=pack("ss", "defense"))
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await message.answer(
+    reply(message,
         "📈 *Статистика игроков*\n\n"
         "👇 Выберите категорию статистики:",
         reply_markup=kb.as_markup(),
@@ -848,9 +1186,8 @@ async def cmd_stats(message: types.Message):
     )
 
 # --- ОБРАБОТЧИКИ ЛИГ ---
-@dp.callback_query(lambda c: c.data.startswith("league_"))
-async def process_league_select(callback: types.CallbackQuery):
-    league_key = callback.data.replace("league_", "")
+@callback_router.route("lg", ("league_key", str), legacy_prefix="league")
+async def process_league_select(callback: types.CallbackQuery, league_key: str):
     league_info = POPULAR_LEAGUES.get(league_key)
     
     if not league_info:
@@ -860,128 +1197,93 @@ async def process_league_select(callback: types.CallbackQuery):
     await callback.answer(f"🔍 Загружаю матчи {league_info['name']}...")
     
     try:
-        internal_url = f"http://127.0.0.1:8080/api/internal/matches/league/{league_info['id']}"
-        resp = requests.get(internal_url, timeout=10)
-        
-        if resp.status_code != 200:
-            await callback.message.answer("❌ *Ошибка при загрузке матчей лиги*", parse_mode="Markdown")
+        try:
+            data = (await match_service.by_league(league_info['id'])).matches
+        except ApiSportError:
+            reply(callback.message, "❌ *Ошибка при загрузке матчей лиги*", parse_mode="Markdown")
             return
-            
-        data = resp.json().get("data", [])
         
         if not data:
-            await callback.message.answer(
+            reply(callback.message,
                 f"⚽ *Нет матчей в лиге {league_info['name']}*\n\n"
                 f"Попробуйте другую лигу или зайдите позже!",
                 parse_mode="Markdown"
             )
             return
             
-        await callback.message.answer(
-            f"🏆 *Матчи {league_info['emoji']} {league_info['name']}*\n"
-            f"📊 Найдено: {len(data)} матчей",
-            parse_mode="Markdown"
-        )
-        
-        for m in data[:5]:
-            match_text = format_match_message(m)
-            await callback.message.answer(match_text, parse_mode="Markdown")
+        reply_match_list(callback.message, f"🏆 *Матчи {league_info['emoji']} {league_info['name']}*", data)
             
     except Exception as e:
-        await callback.message.answer("❌ *Ошибка при загрузке матчей лиги*", parse_mode="Markdown")
+        reply(callback.message, "❌ *Ошибка при загрузке матчей лиги*", parse_mode="Markdown")
+
+# --- ЛИСТАНИЕ СПИСКОВ МАТЧЕЙ ---
+@callback_router.route("nop", legacy=["page_noop"])
+async def process_page_noop(callback: types.CallbackQuery):
+    await callback.answer()
+
+@callback_router.route("pg", ("token", str), ("page", int))
+async def process_page(callback: types.CallbackQuery, token: str, page: int):
+    rendered = match_pages.render(token, page)
+    if rendered is None:
+        await callback.answer("⌛ Список устарел, запросите его заново", show_alert=True)
+        return
+    await callback.answer()
+    text, markup = rendered
+    message = callback.message
+    send_queue.submit_call(
+        message.chat.id,
+        lambda: message.edit_text(text, reply_markup=markup, parse_mode="Markdown"),
+    ).add_done_callback(consume_result)
+
+@callback_router.route("all", legacy=["show_all_matches"])
+async def process_show_all_matches(callback: types.CallbackQuery):
+    # Кнопка из старых сообщений: присылаем список с листанием
+    await callback.answer("⏳ Загружаю матчи...")
+    await cmd_matches(callback.message)
 
 # --- ОБРАБОТЧИКИ ТУРНИРНЫХ ТАБЛИЦ ---
-@dp.callback_query(lambda c: c.data.startswith("table_"))
-async def process_table_select(callback: types.CallbackQuery):
-    league_key = callback.data.replace("table_", "")
-    
-    league_names = {
-        "premier_league": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига Англия",
-        "la_liga": "🇪🇸 Ла Лига Испания",
-        "serie_a": "🇮🇹 Серия А Италия", 
-        "bundesliga": "🇩🇪 Бундеслига Германия"
-    }
-    
-    league_name = league_names.get(league_key)
-    if not league_name:
+@callback_router.route("tb", ("league_key", str), legacy_prefix="table")
+async def process_table_select(callback: types.CallbackQuery, league_key: str):
+    if league_key not in TABLE_LEAGUE_NAMES:
         await callback.answer("❌ Таблица временно недоступна")
         return
     
-    table_data = get_league_table(league_key)
-    if not table_data:
+    table_text = static_messages.get(f"table_{league_key}")
+    if not table_text:
         await callback.answer("❌ Данные таблицы недоступны")
         return
     
-    table_text = format_table_message(league_name, table_data)
-    
     kb = InlineKeyboardBuilder()
-    kb.button(text="📊 Другие таблицы", callback_data="tables_menu")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="📊 Другие таблицы", callback_data=pack("tm"))
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await callback.message.answer(table_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
     await callback.answer()
+    reply(callback.message, table_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
 
 # --- ОБРАБОТЧИКИ СТАТИСТИКИ ---
-@dp.callback_query(lambda c: c.data == "stats_scorers")
-async def process_stats_scorers(callback: types.CallbackQuery):
-    scorers = get_top_scorers(5)
-    stats_text = format_stats_message("scorers", scorers)
-    
-    kb = InlineKeyboardBuilder()
-    kb.button(text="📈 Другие статистики", callback_data="stats_menu")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
-    kb.adjust(1)
-    
-    await callback.message.answer(stats_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
-    await callback.answer()
-
-@dp.callback_query(lambda c: c.data == "stats_assists")
-async def process_stats_assists(callback: types.CallbackQuery):
-    assists = get_top_assists(5)
-    stats_text = format_stats_message("assists", assists)
-    
-    kb = InlineKeyboardBuilder()
-    kb.button(text="📈 Другие статистики", callback_data="stats_menu")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
-    kb.adjust(1)
-    
-    await callback.message.answer(stats_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
-    await callback.answer()
-
-@dp.callback_query(lambda c: c.data == "stats_discipline")
-async def process_stats_discipline(callback: types.CallbackQuery):
-    discipline = get_discipline_stats(5)
-    stats_text = format_stats_message("discipline", discipline)
-    
-    kb = InlineKeyboardBuilder()
-    kb.button(text="📈 Другие статистики", callback_data="stats_menu")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
-    kb.adjust(1)
-    
-    await callback.message.answer(stats_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
-    await callback.answer()
-
-@dp.callback_query(lambda c: c.data == "stats_defense")
-async def process_stats_defense(callback: types.CallbackQuery):
-    defense = get_defense_stats(5)
-    stats_text = format_stats_message("defense", defense)
+@callback_router.route("ss", ("stats_type", str), legacy_prefix="stats")
+async def process_stats_select(callback: types.CallbackQuery, stats_type: str):
+    stats_text = static_messages.get(f"stats_{stats_type}")
+    if not stats_text:
+        await callback.answer("❌ Статистика недоступна")
+        return
     
     kb = InlineKeyboardBuilder()
-    kb.button(text="📈 Другие статистики", callback_data="stats_menu")
-    kb.button(text="🔙 Главное меню", callback_data="main_menu")
+    kb.button(text="📈 Другие статистики", callback_data=pack("sm"))
+    kb.button(text="🔙 Главное меню", callback_data=pack("m"))
     kb.adjust(1)
     
-    await callback.message.answer(stats_text, reply_markup=kb.as_markup(), parse_mode="Markdown")
     await callback.answer()
+    reply(callback.message, stats_text + format_updated(), reply_markup=kb.as_markup(), parse_mode="Markdown")
 
 # --- ОБРАБОТЧИКИ НАСТРОЕК ---
-@dp.callback_query(lambda c: c.data == "enable_notifications")
+@callback_router.route("ne", legacy=["enable_notifications"])
 async def process_enable_notifications(callback: types.CallbackQuery):
     user_id = callback.from_user.id
-    user_notifications[user_id] = True
+    users.set_notifications(user_id, True)
     await callback.answer("✅ Уведомления включены")
-    await callback.message.answer(
+    reply(callback.message,
         "🔔 *Уведомления включены!*\n\n"
         "Теперь вы будете получать уведомления о:\n"
         "• 📅 Начале матчей\n"
@@ -990,35 +1292,146 @@ async def process_enable_notifications(callback: types.CallbackQuery):
         parse_mode="Markdown"
     )
 
-@dp.callback_query(lambda c: c.data == "disable_notifications")
+@callback_router.route("nd", legacy=["disable_notifications"])
 async def process_disable_notifications(callback: types.CallbackQuery):
     user_id = callback.from_user.id
-    user_notifications[user_id] = False
+    users.set_notifications(user_id, False)
     await callback.answer("🔕 Уведомления выключены")
-    await callback.message.answer(
+    reply(callback.message,
         "🔕 *Уведомления выключены*\n\n"
         "Вы больше не будете получать уведомления.\n"
         "Включить их можно в любое время в настройках.",
         parse_mode="Markdown"
     )
 
-@dp.callback_query(lambda c: c.data == "main_menu")
+@callback_router.route("m", legacy=["main_menu"])
 async def process_main_menu(callback: types.CallbackQuery):
     await callback.answer("🏠 Возвращаюсь в главное меню...")
     await cmd_start(callback.message)
 
+@dp.callback_query()
+async def process_callback(callback: types.CallbackQuery, callback_route=None):
+    if not await callback_router.dispatch(callback, callback_route):
+        await callback.answer("⌛ Кнопка устарела, откройте меню заново")
+
+# --- INLINE-РЕЖИМ ---
+# Ответы строятся только из индексов в памяти: если снимка матчей нет,
+# отдаем пустой список, а не ждем API-Sport на каждое нажатие клавиши
+def inline_matches(query: str):
+    """(матчи, live ли они, cache_time) для текста inline-запроса"""
+    store = match_service.cached()
+    query = query.strip()
+    if query.casefold() in ("live", "лайв"):
+        matches = store.by_status('inprogress') if store else []
+        return matches, True, INLINE_CACHE_TIME_LIVE
+    if not query:
+        now = now_ms()
+        matches = store.starting_between(now, now + 2 * 3600 * 1000) if store else []
+        return matches, False, INLINE_CACHE_TIME_UPCOMING
+    matches, seen = [], set()
+    for hit in team_index.search(query):
+        if store is None or hit.team.team_id is None:
+            continue
+        for m in store.by_team(hit.team.team_id):
+            if match_key(m) not in seen:
+                seen.add(match_key(m))
+                matches.append(m)
+    return matches, False, INLINE_CACHE_TIME_TEAM
+
+def inline_article(match: Match, is_live: bool) -> types.InlineQueryResultArticle:
+    live = is_live or match.status == 'inprogress'
+    if live:
+        description = f"🔴 {match.home_score} - {match.away_score} · {match.tournament_name}"
+    else:
+        start = match.start_time_msk
+        description = f"🕒 {start.strftime('%H:%M МСК') if start else '—'} · {match.tournament_name}"
+    return types.InlineQueryResultArticle(
+        id=match_key(match)[:64],
+        title=f"{match.home_name} — {match.away_name}",
+        description=description,
+        input_message_content=types.InputTextMessageContent(
+            message_text=format_match_message(match, is_live=live),
+            parse_mode="Markdown",
+        ),
+    )
+
+@dp.inline_query()
+async def process_inline_query(inline_query: types.InlineQuery):
+    matches, is_live, cache_time = inline_matches(inline_query.query)
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page = matches[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(matches) else ""
+    await inline_query.answer(
+        [inline_article(m, is_live) for m in page],
+        cache_time=cache_time,
+        is_personal=False,
+        next_offset=next_offset,
+    )
+
 # --- ЗАПУСК БОТА И API ---
-def run_bot():
-    asyncio.run(dp.start_polling(bot))
+async def start_services():
+    await users.start()
+    subscribers.load(users.all_favorites())
+    send_queue.start()
+    await http_client.start()
+    prefetcher.start()
+    loop_lag.start()
+
+async def stop_services():
+    await loop_lag.stop()
+    await prefetcher.stop()
+    await send_queue.stop()
+    await users.close()
+    await http_client.close()
+    await bot.session.close()
+
+async def main():
+    """uvicorn и aiogram как задачи одного event loop с общей остановкой"""
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await start_services()
+    server = ApiServer(uvicorn.Config(app, host="0.0.0.0", port=8080))
+    tasks = [asyncio.create_task(server.serve(), name="api")]
+    log.info("🌐 FastAPI запущен на порту 8080")
+
+    if BOT_MODE == "webhook":
+        await bot.set_webhook(
+            f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        log.info("🪝 Webhook установлен")
+    else:
+        # Если раньше работали через webhook, getUpdates без этого не заработает
+        await bot.delete_webhook()
+        tasks.append(asyncio.create_task(
+            dp.start_polling(bot, handle_signals=False, close_bot_session=False), name="polling"
+        ))
+
+    stop_task = asyncio.create_task(stop_event.wait())
+    await asyncio.wait([stop_task, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    log.info("🛑 Остановка...")
 
-def run_api():
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # Сначала перестаем принимать новые апдейты, затем дожидаемся текущих,
+    # и только после этого гасим HTTP-сервер и общие ресурсы.
+    # Webhook не удаляем: реплика одна (Recreate), и пока новый pod не
+    # поднялся, Telegram копит апдейты и повторяет доставку, а не теряет их.
+    if BOT_MODE == "polling":
+        try:
+            await dp.stop_polling()
+        except RuntimeError:
+            pass
+    await inflight.drain(SHUTDOWN_GRACE, extra=webhook_tasks)
+    # Открытые SSE-потоки иначе не дали бы uvicorn завершиться
+    live_feed.close()
+    server.should_exit = True
+    stop_task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await stop_services()
 
 if __name__ == "__main__":
     log.info("🚀 Запуск бота с улучшенным визуалом")
-    
-    t_api = threading.Thread(target=run_api, daemon=True)
-    t_api.start()
-    log.info("🌐 FastAPI запущен на порту 8080")
-    
-    run_bot()
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+# Слой доступа к матчам внутри процесса.
+# И FastAPI-маршруты, и обработчики aiogram вызывают его напрямую,
+# без HTTP-запросов самим себе.
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from match_store import MatchStore
+from tracing import span
+
+MSK_OFFSET = timedelta(hours=3)
+
+# fetch(date, status, tournament_id, team_id) -> список матчей из API-Sport
+MatchFetcher = Callable[..., Awaitable[List[Dict[str, Any]]]]
+# snapshots(date) -> свежий снимок матчей за дату (с атрибутом matches) или None
+SnapshotSource = Callable[[str], Any]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def today_utc() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+@dataclass(frozen=True)
+class Match:
+    """Матч в удобном для бота виде; исходный JSON API-Sport лежит в raw"""
+    id: Optional[int]
+    status: Optional[str]
+    start_timestamp: Optional[int]
+    tournament_id: Optional[int]
+    tournament_name: str
+    home_id: Optional[int]
+    home_name: str
+    away_id: Optional[int]
+    away_name: str
+    home_score: int
+    away_score: int
+    raw: Dict[str, Any] = field(repr=False, compare=False)
+
+    @classmethod
+    def from_api(cls, data: Dict[str, Any]) -> "Match":
+        tournament = data.get("tournament") or {}
+        home_team = data.get("homeTeam") or {}
+        away_team = data.get("awayTeam") or {}
+        return cls(
+            id=data.get("id"),
+            status=data.get("status"),
+            start_timestamp=data.get("startTimestamp"),
+            tournament_id=tournament.get("id"),
+            tournament_name=tournament.get("name", "—"),
+            home_id=home_team.get("id"),
+            home_name=home_team.get("name", "Home"),
+            away_id=away_team.get("id"),
+            away_name=away_team.get("name", "Away"),
+            home_score=(data.get("homeScore") or {}).get("current", 0) or 0,
+            away_score=(data.get("awayScore") or {}).get("current", 0) or 0,
+            raw=data,
+        )
+
+    @property
+    def start_time_msk(self) -> Optional[datetime]:
+        if not self.start_timestamp:
+            return None
+        return datetime.utcfromtimestamp(self.start_timestamp / 1000) + MSK_OFFSET
+
+
+@dataclass
+class MatchList:
+    matches: List[Match]
+    today_total: int
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Формат ответа /api/matches и /api/internal/*"""
+        return {
+            "data": [m.raw for m in self.matches],
+            "total": len(self.matches),
+            "today_total": self.today_total,
+        }
+
+
+class MatchService:
+    def __init__(self, fetch: MatchFetcher, snapshots: Optional[SnapshotSource] = None):
+        self._fetch = fetch
+        self._snapshots = snapshots
+        self._stores: Dict[str, MatchStore] = {}
+
+    def on_snapshot(self, snapshot):
+        """Инкрементально применить новый снимок к индексу его даты"""
+        store = self._stores.get(snapshot.date)
+        if store is None:
+            store = self._stores[snapshot.date] = MatchStore()
+        store.update(snapshot.matches)
+        # Индексы прошедших дней больше не нужны (завтрашний снимок
+        # не должен вытеснять сегодняшний)
+        today = today_utc()
+        for date in [d for d in self._stores if d < today]:
+            del self._stores[date]
+
+    def cached(self, date=None) -> Optional[MatchStore]:
+        """Индекс из свежего снимка без похода в API; None, если снимка нет"""
+        if date is None:
+            date = today_utc()
+        if self._snapshots is not None and self._snapshots(date) is not None:
+            return self._stores.get(date)
+        return None
+
+    async def _store(self, date=None, status=None, tournament_id=None, team_id=None) -> MatchStore:
+        if date is None:
+            date = today_utc()
+        store = self.cached(date)
+        if store is not None:
+            return store
+        # Снимка нет (фон еще не успел или отстал) — идем в API через кэш
+        raw = await self._fetch(date, status, tournament_id, team_id)
+        return MatchStore(Match.from_api(m) for m in raw)
+
+    @staticmethod
+    def _window(hours: float):
+        start = now_ms()
+        return start, start + int(hours * 3600 * 1000)
+
+    async def query(self, date=None, status=None, tournament_id=None, team_id=None, hours: float = 2) -> MatchList:
+        """Матчи за день; для не-live запросов — только стартующие в ближайшие hours часов"""
+        with span("matches.store"):
+            store = await self._store(date, status, tournament_id, team_id)
+        with span("matches.filter", status=status) as filter_span:
+            total = store.count(status, tournament_id, team_id)
+            if status == 'inprogress':
+                matches = store.select(status, tournament_id, team_id)
+            else:
+                start, end = self._window(hours)
+                matches = store.starting_between(start, end, status, tournament_id, team_id)
+            filter_span.set(found=len(matches))
+        return MatchList(matches, total)
+
+    async def upcoming(self, hours: float = 2) -> MatchList:
+        return await self.query(hours=hours)
+
+    async def live(self) -> MatchList:
+        return await self.query(status='inprogress')
+
+    async def by_league(self, tournament_id: int) -> MatchList:
+        """Все матчи лиги на сегодня"""
+        store = await self._store(tournament_id=tournament_id)
+        matches = store.by_tournament(tournament_id)
+        return MatchList(matches, len(matches))
+
+    async def by_team(self, team_id: int) -> MatchList:
+        """Все матчи команды на сегодня"""
+        store = await self._store(team_id=team_id)
+        matches = store.by_team(team_id)
+        return MatchList(matches, len(matches))
+
+    async def random_upcoming(self, hours: float = 1) -> Optional[Match]:
+        store = await self._store()
+        matches = store.starting_between(*self._window(hours))
+        return random.choice(matches) if matches else None
@@ -0,0 +1,132 @@
+# Индекс матчей за день: сортировка по startTimestamp плюс вторичные
+# индексы по турниру, команде и статусу. Окна "ближайшие N часов"
+# отвечаются бинарным поиском по целым миллисекундам epoch.
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from match_service import Match
+
+
+def match_key(match: "Match") -> str:
+    if match.id is not None:
+        return str(match.id)
+    return f"{match.home_name}|{match.away_name}|{match.start_timestamp}"
+
+
+class MatchStore:
+    def __init__(self, matches: Iterable["Match"] = ()):
+        self._by_key: Dict[str, "Match"] = {}
+        # Отсортированный список (start_ms, key); матчи без времени сюда не попадают
+        self._timeline: List[Tuple[int, str]] = []
+        self._by_tournament: Dict[int, Set[str]] = {}
+        self._by_team: Dict[int, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        if matches:
+            self.update(matches)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def get(self, key: str) -> Optional["Match"]:
+        return self._by_key.get(key)
+
+    # --- ОБНОВЛЕНИЕ ---
+    def _index(self, key: str, match: "Match"):
+        self._by_key[key] = match
+        if match.start_timestamp:
+            insort(self._timeline, (match.start_timestamp, key))
+        if match.tournament_id is not None:
+            self._by_tournament.setdefault(match.tournament_id, set()).add(key)
+        for team_id in (match.home_id, match.away_id):
+            if team_id is not None:
+                self._by_team.setdefault(team_id, set()).add(key)
+        if match.status:
+            self._by_status.setdefault(match.status, set()).add(key)
+
+    @staticmethod
+    def _discard(index: Dict, value, key: str):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    def _unindex(self, key: str):
+        match = self._by_key.pop(key)
+        if match.start_timestamp:
+            entry = (match.start_timestamp, key)
+            i = bisect_left(self._timeline, entry)
+            if i < len(self._timeline) and self._timeline[i] == entry:
+                del self._timeline[i]
+        self._discard(self._by_tournament, match.tournament_id, key)
+        for team_id in (match.home_id, match.away_id):
+            self._discard(self._by_team, team_id, key)
+        self._discard(self._by_status, match.status, key)
+
+    def update(self, matches: Iterable["Match"]) -> Tuple[int, int, int]:
+        """Привести индекс к новому снимку, трогая только изменившиеся матчи.
+
+        Возвращает (добавлено, изменено, удалено).
+        """
+        added = changed = 0
+        seen = set()
+        for match in matches:
+            key = match_key(match)
+            seen.add(key)
+            current = self._by_key.get(key)
+            if current is None:
+                self._index(key, match)
+                added += 1
+            elif current != match:
+                self._unindex(key)
+                self._index(key, match)
+                changed += 1
+        removed_keys = [key for key in self._by_key if key not in seen]
+        for key in removed_keys:
+            self._unindex(key)
+        return added, changed, len(removed_keys)
+
+    # --- ЗАПРОСЫ ---
+    def _select(self, status=None, tournament_id=None, team_id=None) -> Optional[Set[str]]:
+        """Пересечение вторичных индексов; None означает "без фильтра" """
+        selected: Optional[Set[str]] = None
+        for index, value in ((self._by_status, status), (self._by_tournament, tournament_id), (self._by_team, team_id)):
+            if value is None:
+                continue
+            keys = index.get(value, set())
+            selected = keys if selected is None else selected & keys
+        return selected
+
+    def _sorted(self, keys: Iterable[str]) -> List["Match"]:
+        return sorted((self._by_key[k] for k in keys), key=lambda m: m.start_timestamp or 0)
+
+    def starting_between(self, start_ms: int, end_ms: int, status=None, tournament_id=None, team_id=None) -> List["Match"]:
+        """Матчи со стартом в [start_ms, end_ms], по возрастанию времени"""
+        lo = bisect_left(self._timeline, (start_ms, ""))
+        hi = bisect_left(self._timeline, (end_ms + 1, ""))
+        selected = self._select(status, tournament_id, team_id)
+        return [
+            self._by_key[key]
+            for _, key in self._timeline[lo:hi]
+            if selected is None or key in selected
+        ]
+
+    def select(self, status=None, tournament_id=None, team_id=None) -> List["Match"]:
+        selected = self._select(status, tournament_id, team_id)
+        if selected is None:
+            return self._sorted(self._by_key)
+        return self._sorted(selected)
+
+    def by_status(self, status: str) -> List["Match"]:
+        return self._sorted(self._by_status.get(status, ()))
+
+    def by_tournament(self, tournament_id: int) -> List["Match"]:
+        return self._sorted(self._by_tournament.get(tournament_id, ()))
+
+    def by_team(self, team_id: int) -> List["Match"]:
+        return self._sorted(self._by_team.get(team_id, ()))
+
+    def count(self, status=None, tournament_id=None, team_id=None) -> int:
+        selected = self._select(status, tournament_id, team_id)
+        return len(self._by_key) if selected is None else len(selected)
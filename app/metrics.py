@@ -0,0 +1,236 @@
+# Метрики в текстовом формате Prometheus (/metrics).
+# Запись — обычные операции со словарями в потоке event loop, без
+# блокировок; гистограммы с заранее заданными границами. Счетчики,
+# которые компоненты уже ведут в stats, читаются только при сборе.
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы по умолчанию (секунды): от быстрых обработчиков до таймаута HTTP
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+Collect = Callable[[], Dict[LabelValues, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception:
+                log.exception(f"Ошибка сбора метрики {metric.name}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 collect: Optional[Collect] = None, registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values: Dict[LabelValues, float] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def values(self) -> Dict[LabelValues, float]:
+        return self.collect() if self.collect is not None else self._values
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+                for key, value in self.values().items()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labels, registry=registry)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счетчики по корзинам (+Inf последней), сумма]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def from_stats(stats: Callable[[], Dict[str, Any]], keys: Sequence[str]) -> Collect:
+    """collect-функция, читающая выбранные поля stats компонента при сборе"""
+    def collect() -> Dict[LabelValues, float]:
+        current = stats()
+        return {(key,): current[key] for key in keys if key in current}
+    return collect
+
+
+class HandlerTimer(BaseMiddleware):
+    """Inner-middleware: время и ошибки обработчиков aiogram.
+
+    name(event, data) может уточнить имя обработчика — например, для общего
+    хендлера кнопок вернуть обработчик маршрута CallbackRouter.
+    """
+
+    def __init__(self, latency: Histogram, errors: Counter,
+                 name: Optional[Callable[[TelegramObject, Dict[str, Any]], Optional[str]]] = None):
+        self.latency = latency
+        self.errors = errors
+        self.name = name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = (self.name and self.name(event, data)) or data["handler"].callback.__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors.inc(name)
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start, name)
+
+
+class RequestTimer:
+    """ASGI-middleware: время до заголовков ответа по шаблону маршрута FastAPI.
+
+    Считается до http.response.start, а не до конца тела, чтобы
+    долгие потоки (SSE) не искажали распределение.
+    """
+
+    def __init__(self, app, latency: Histogram):
+        self.app = app
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        observed = False
+
+        def observe(status: int):
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            self.latency.observe(time.perf_counter() - start, scope["method"], path, str(status))
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        except Exception:
+            if not observed:
+                observe(500)
+            raise
+
+
+class LoopLagMonitor:
+    """Насколько позже запланированного просыпается event loop"""
+
+    def __init__(self, lag: Histogram, interval: float = 0.5):
+        self.lag = lag
+        self.interval = interval
+        self.last = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, time.perf_counter() - start - self.interval)
+            self.lag.observe(self.last)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
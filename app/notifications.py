@@ -0,0 +1,152 @@
+# Уведомления подписчикам: скорый старт матча, голы и итоговый счет
+# матчей избранных команд. Получатели ищутся по инвертированному
+# индексу команда -> пользователи, а не перебором всего избранного.
+# Голы и результаты приходят событиями шины live_events.
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from live_events import REMOVED, SCORE, MatchEvent
+from match_service import Match, now_ms, today_utc
+from match_store import match_key
+from sender import SendQueue, consume_result
+from team_index import search_key
+
+log = logging.getLogger(__name__)
+
+
+TeamKeys = Callable[[str, Optional[int]], Iterable[str]]
+
+
+def _name_keys(name: str, team_id: Optional[int] = None) -> Iterable[str]:
+    return (search_key(name),)
+
+
+class SubscriberIndex:
+    """Подписки хранятся под search_key названия из избранного.
+
+    Команды матча переводятся в ключи функцией team_keys: TeamIndex
+    добавляет ключ, под которым команда с этим id впервые попала в
+    индекс, поэтому переименование в данных не теряет подписчиков.
+    """
+
+    def __init__(self, team_keys: TeamKeys = _name_keys):
+        self.team_keys = team_keys
+        self._by_team: Dict[str, Set[int]] = {}
+
+    def load(self, favorites: Dict[int, List[str]]):
+        self._by_team.clear()
+        for user_id, teams in favorites.items():
+            for team in teams:
+                self.add(user_id, team)
+
+    def add(self, user_id: int, team: str):
+        self._by_team.setdefault(search_key(team), set()).add(user_id)
+
+    def remove(self, user_id: int, team: str):
+        key = search_key(team)
+        users = self._by_team.get(key)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._by_team[key]
+
+    def subscribers(self, teams: Iterable[Tuple[str, Optional[int]]]) -> Set[int]:
+        """Подписчики команд, заданных парами (название, id)"""
+        result: Set[int] = set()
+        for name, team_id in teams:
+            for key in set(self.team_keys(name, team_id)):
+                result |= self._by_team.get(key, set())
+        return result
+
+
+class NotificationScheduler:
+    """Голы и итоговый счет приходят событиями DeltaEngine (on_events),
+    напоминание о скором начале — по времени из снимка (on_snapshot)."""
+
+    def __init__(
+        self,
+        subscribers: SubscriberIndex,
+        sender: SendQueue,
+        is_enabled: Callable[[int], bool],
+        kickoff_lead_minutes: float = 15,
+    ):
+        self.subscribers = subscribers
+        self.sender = sender
+        self.is_enabled = is_enabled
+        self.kickoff_lead_ms = int(kickoff_lead_minutes * 60 * 1000)
+        self._kickoff_sent: Set[str] = set()
+        self._keys_by_date: Dict[str, Set[str]] = {}
+
+    def _notify(self, match: Match, text: str, group: object) -> int:
+        """group — одна рассылка: ее уведомления в один чат могут уйти одним сообщением"""
+        recipients = [uid for uid in self.subscribers.subscribers(
+            ((match.home_name, match.home_id), (match.away_name, match.away_id)))
+                      if self.is_enabled(uid)]
+        for user_id in recipients:
+            self.sender.submit(user_id, text, group=group, parse_mode="Markdown").add_done_callback(consume_result)
+        return len(recipients)
+
+    def on_events(self, events: List[MatchEvent]):
+        """Разослать уведомления о голах и завершенных матчах"""
+        sent = 0
+        group = object()
+        for event in events:
+            if event.kind == SCORE and event.match.status == 'inprogress':
+                sent += self._notify(event.match, format_goal(event.match), group)
+            elif event.finished and event.previous.status != 'finished':
+                sent += self._notify(event.match, format_result(event.match), group)
+            elif event.kind == REMOVED:
+                self._kickoff_sent.discard(event.key)
+        if sent:
+            log.info(f"📨 Поставлено в очередь уведомлений: {sent}")
+
+    def on_snapshot(self, snapshot):
+        """Напомнить о матчах, которые начнутся в ближайшие kickoff_lead минут"""
+        now = now_ms()
+        keys = set()
+        sent = 0
+        group = object()
+        for match in snapshot.matches:
+            key = match_key(match)
+            keys.add(key)
+            if (match.status == 'notstarted' and key not in self._kickoff_sent
+                    and match.start_timestamp and now <= match.start_timestamp <= now + self.kickoff_lead_ms):
+                self._kickoff_sent.add(key)
+                sent += self._notify(match, format_kickoff(match), group)
+
+        self._keys_by_date[snapshot.date] = keys
+        today = today_utc()
+        for date in [d for d in self._keys_by_date if d < today]:
+            self._kickoff_sent.difference_update(self._keys_by_date.pop(date))
+        if sent:
+            log.info(f"📨 Поставлено в очередь напоминаний: {sent}")
+
+
+# --- ШАБЛОНЫ УВЕДОМЛЕНИЙ ---
+def format_kickoff(match: Match) -> str:
+    start = match.start_time_msk
+    time_str = start.strftime("%H:%M МСК") if start else "—"
+    return (
+        f"🔔 *Скоро начало!*\n"
+        f"────────────────\n"
+        f"🏆 {match.tournament_name}\n"
+        f"🏠 *{match.home_name}*   vs   *{match.away_name}* ✈️\n"
+        f"🕒 *Начало:* {time_str}"
+    )
+
+
+def format_goal(match: Match) -> str:
+    return (
+        f"⚽ *ГОЛ!* {match.tournament_name}\n"
+        f"────────────────\n"
+        f"🏠 *{match.home_name}*   {match.home_score} - {match.away_score}   *{match.away_name}* ✈️"
+    )
+
+
+def format_result(match: Match) -> str:
+    return (
+        f"🏁 *Матч завершен*\n"
+        f"────────────────\n"
+        f"🏆 {match.tournament_name}\n"
+        f"🏠 *{match.home_name}*   {match.home_score} - {match.away_score}   *{match.away_name}* ✈️"
+    )
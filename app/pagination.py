@@ -0,0 +1,111 @@
+# Постраничный вывод списков матчей в одном сообщении.
+# Список сохраняется на сервере под коротким токеном, кнопки
+# ◀️/▶️ редактируют то же сообщение без повторного запроса к API.
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from callbacks import pack
+from match_service import Match
+
+
+@dataclass(frozen=True)
+class ResultSet:
+    title: str
+    matches: List[Match]
+    is_live: bool = False
+
+
+class MatchPages:
+    """LRU списков со скользящим TTL: листание продлевает жизнь списка.
+
+    Срок продлевается при каждом обращении, поэтому порядок в OrderedDict
+    совпадает с порядком истечения: истекшие и вытесняемые списки всегда
+    в начале, и store не перебирает все записи.
+    """
+
+    def __init__(
+        self,
+        format_match: Callable[[Match, bool], str],
+        page_size: int = 5,
+        ttl: float = 900.0,
+        max_entries: int = 20000,
+    ):
+        self.format_match = format_match
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Tuple[float, ResultSet]]" = OrderedDict()
+        self.stats = {"stored": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def store(self, result: ResultSet) -> str:
+        now = time.monotonic()
+        self._prune(now)
+        token = secrets.token_hex(4)
+        # Живой список другого пользователя не перезаписываем
+        while token in self._results:
+            token = secrets.token_hex(4)
+        self._results[token] = (now + self.ttl, result)
+        self.stats["stored"] += 1
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+            self.stats["evicted"] += 1
+        return token
+
+    def _prune(self, now: float):
+        while self._results:
+            expires_at, _ = next(iter(self._results.values()))
+            if expires_at >= now:
+                break
+            self._results.popitem(last=False)
+            self.stats["expired"] += 1
+
+    def _get(self, token: str) -> Optional[ResultSet]:
+        entry = self._results.get(token)
+        now = time.monotonic()
+        if entry is None or entry[0] < now:
+            self.stats["misses"] += 1
+            return None
+        self._results[token] = (now + self.ttl, entry[1])
+        self._results.move_to_end(token)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["entries"] = len(self._results)
+        stats["max_entries"] = self.max_entries
+        return stats
+
+    def page_count(self, result: ResultSet) -> int:
+        return max(1, -(-len(result.matches) // self.page_size))
+
+    def render(self, token: str, page: int = 0) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """Текст и клавиатура страницы; None, если список уже истек"""
+        result = self._get(token)
+        if result is None:
+            return None
+        pages = self.page_count(result)
+        page = min(max(page, 0), pages - 1)
+        start = page * self.page_size
+        cards = [self.format_match(m, result.is_live) for m in result.matches[start:start + self.page_size]]
+
+        text = f"{result.title}\n📊 Найдено: {len(result.matches)}"
+        if pages > 1:
+            text += f" · страница {page + 1}/{pages}"
+        text += "\n\n" + "\n\n".join(cards)
+
+        kb = InlineKeyboardBuilder()
+        if pages > 1:
+            kb.button(text="◀️", callback_data=pack("pg", token, page - 1) if page > 0 else pack("nop"))
+            kb.button(text=f"{page + 1}/{pages}", callback_data=pack("nop"))
+            kb.button(text="▶️", callback_data=pack("pg", token, page + 1) if page < pages - 1 else pack("nop"))
+        kb.button(text="🔙 Главное меню", callback_data=pack("m"))
+        kb.adjust(3, 1)
+        return text, kb.as_markup()
+
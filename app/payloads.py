@@ -0,0 +1,56 @@
+# Заранее сериализованные JSON-ответы со строгими ETag.
+# Данные статистики и таблиц меняются только при деплое, поэтому
+# кодируем их в байты один раз и отдаем 304 на совпавший If-None-Match.
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class StaticPayload:
+    def __init__(self, content: Any, max_age: int = 300):
+        self.body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        self.etag = make_etag(self.body)
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+
+    def response(self, request: Request) -> Response:
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+class PayloadRegistry:
+    """Набор готовых ответов по имени; set() пересобирает ответ при смене данных"""
+
+    def __init__(self, max_age: int = 300):
+        self.max_age = max_age
+        self._payloads: Dict[str, StaticPayload] = {}
+
+    def set(self, name: str, content: Any):
+        self._payloads[name] = StaticPayload(content, max_age=self.max_age)
+
+    def get(self, name: str) -> Optional[StaticPayload]:
+        return self._payloads.get(name)
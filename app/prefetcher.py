@@ -0,0 +1,142 @@
+# Фоновое обновление списка матчей на сегодня (и, опционально, на завтра).
+# Все чтения обслуживаются из последнего снимка, а не запросом к API-Sport.
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from match_service import Match, now_ms
+
+log = logging.getLogger(__name__)
+
+# load(date) -> список матчей за дату напрямую из API-Sport, без кэша
+DayLoader = Callable[[str], Awaitable[List[Dict[str, Any]]]]
+SnapshotListener = Callable[["Snapshot"], Any]
+
+KICKOFF_GRACE_MS = 30 * 60 * 1000
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    date: str
+    matches: List[Match]
+    fetched_at: float  # time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    @property
+    def has_live(self) -> bool:
+        return any(m.status == 'inprogress' for m in self.matches)
+
+
+class FixturePrefetcher:
+    """Держит теплым список матчей с адаптивным интервалом обновления.
+
+    Пока есть live-матчи (или кто-то вот-вот начнет), обновляет каждые
+    live_interval секунд, иначе — каждые idle_interval секунд. Если задан
+    interval_scale, интервалы умножаются на его значение (например, когда
+    заканчивается квота запросов).
+    """
+
+    def __init__(
+        self,
+        load: DayLoader,
+        live_interval: float = 5.0,
+        idle_interval: float = 180.0,
+        error_interval: float = 30.0,
+        include_tomorrow: bool = False,
+        interval_scale: Optional[Callable[[], float]] = None,
+    ):
+        self._load = load
+        self.live_interval = live_interval
+        self.idle_interval = idle_interval
+        self.error_interval = error_interval
+        self.include_tomorrow = include_tomorrow
+        self.interval_scale = interval_scale
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._listeners: List[SnapshotListener] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: SnapshotListener):
+        """listener(snapshot) вызывается после каждого успешного обновления"""
+        self._listeners.append(listener)
+
+    def snapshot(self, date: str) -> Optional[Snapshot]:
+        """Свежий снимок за дату или None, если его нет или он устарел"""
+        snapshot = self._snapshots.get(date)
+        if snapshot is None or snapshot.age > self.idle_interval * 2 * self._scale():
+            return None
+        return snapshot
+
+    def _scale(self) -> float:
+        return self.interval_scale() if self.interval_scale else 1.0
+
+    def _dates(self) -> List[str]:
+        today = datetime.utcnow()
+        dates = [today.strftime("%Y-%m-%d")]
+        if self.include_tomorrow:
+            dates.append((today + timedelta(days=1)).strftime("%Y-%m-%d"))
+        return dates
+
+    async def refresh(self, date: str) -> Snapshot:
+        raw = await self._load(date)
+        snapshot = Snapshot(date, [Match.from_api(m) for m in raw], time.monotonic())
+        self._snapshots[date] = snapshot
+        for listener in self._listeners:
+            try:
+                result = listener(snapshot)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                log.exception("Ошибка обработчика снимка матчей")
+        return snapshot
+
+    def _next_interval(self, today: Snapshot) -> float:
+        if today.has_live:
+            return self.live_interval
+        # Матч, который стартует до следующего планового обновления (или
+        # уже должен был начаться), требует частого опроса — иначе смена
+        # статуса на inprogress дойдет до пользователей с опозданием
+        now = now_ms()
+        since = now - KICKOFF_GRACE_MS
+        until = now + int(self.idle_interval * 1000)
+        if any(m.start_timestamp and since <= m.start_timestamp <= until and m.status == 'notstarted'
+               for m in today.matches):
+            return self.live_interval
+        return self.idle_interval
+
+    async def _run(self):
+        while True:
+            dates = self._dates()
+            try:
+                today = await self.refresh(dates[0])
+                for date in dates[1:]:
+                    # Завтрашний список меняется редко — обновляем его в темпе простоя
+                    current = self._snapshots.get(date)
+                    if current is None or current.age >= self.idle_interval:
+                        await self.refresh(date)
+                interval = self._next_interval(today)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Не удалось обновить список матчей: {e}")
+                interval = self.error_interval
+            await asyncio.sleep(interval * self._scale())
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="fixture-prefetcher")
+            log.info("🔄 Фоновое обновление матчей запущено")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
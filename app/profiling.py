@@ -0,0 +1,91 @@
+# Профилирование работающего процесса по запросу администратора.
+# cProfile — точные счетчики вызовов, но замедляет все, что выполняется
+# в event loop; sampling — периодические снимки стека потока event loop
+# почти без накладных расходов. Одновременно идет только один сеанс.
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Tuple
+
+MODES = ("cprofile", "sample")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class Profiler:
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._busy = False
+
+    async def run(self, mode: str, seconds: float, limit: int = 40) -> str:
+        if mode not in MODES:
+            raise ValueError(f"mode должен быть одним из: {', '.join(MODES)}")
+        if self._busy:
+            raise ProfilerBusy("Профилирование уже идет")
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        self._busy = True
+        try:
+            if mode == "cprofile":
+                return await self._cprofile(seconds, limit)
+            return await self._sample(seconds, limit)
+        finally:
+            self._busy = False
+
+    async def _cprofile(self, seconds: float, limit: int) -> str:
+        # Event loop работает в этом же потоке, поэтому профилируется
+        # все, что он выполнит за время ожидания
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    async def _sample(self, seconds: float, limit: int, interval: float = 0.005) -> str:
+        """Снимки стека потока event loop из отдельного потока; вывод в folded-формате flamegraph"""
+        target = threading.get_ident()
+        stacks: Dict[Tuple[str, ...], int] = Counter()
+        stop = threading.Event()
+
+        def sampler():
+            while not stop.wait(interval):
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks[tuple(reversed(stack))] += 1
+
+        thread = threading.Thread(target=sampler, name="profile-sampler", daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(thread.join)
+
+        total = sum(stacks.values())
+        own: Dict[str, int] = Counter()
+        for stack, count in stacks.items():
+            own[stack[-1]] += count
+        lines = [f"samples: {total}, interval: {interval * 1000:.0f} ms", "", "# self"]
+        lines += [f"{count:6d} {count / total:6.1%}  {name}" for name, count in own.most_common(limit)] if total else []
+        lines += ["", "# stacks (folded)"]
+        lines += [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common(limit)]
+        return "\n".join(lines) + "\n"
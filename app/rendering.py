@@ -0,0 +1,38 @@
+# Кэш готовых текстов сообщений.
+# Одна и та же карточка матча уходит тысячам пользователей, поэтому
+# Markdown собирается один раз на версию данных матча.
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class RenderCache:
+    """LRU: ключ описывает все, от чего зависит текст"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return text
+        self.stats["misses"] += 1
+        text = render()
+        self._entries[key] = text
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return text
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        total = stats["hits"] + stats["misses"]
+        stats["entries"] = len(self._entries)
+        stats["hit_ratio"] = round(stats["hits"] / total, 4) if total else 0.0
+        return stats
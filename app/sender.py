@@ -0,0 +1,267 @@
+# Очередь исходящих сообщений Telegram с ограничением скорости.
+# Telegram допускает ~30 сообщений/с суммарно и ~1 сообщение/с в один чат.
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+log = logging.getLogger(__name__)
+
+# Лимит длины текста сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Сколько ждать до появления токена (0 — можно сейчас)"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+
+@dataclass
+class _Item:
+    future: asyncio.Future
+    # Текст для sendMessage (такие сообщения можно склеивать)
+    # либо произвольный вызов Bot API
+    text: Optional[str] = None
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    call: Optional[Callable[[], Awaitable[Any]]] = None
+    # Склеиваются только сообщения одной группы (ответы на одну команду)
+    group: Optional[Hashable] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    def can_append(self, other: "_Item", length: int) -> bool:
+        """Можно ли дописать other к группе длиной length, которая заканчивается self.
+
+        Клавиатура разрешена только у последнего сообщения группы:
+        она окажется под склеенным текстом.
+        """
+        if self.text is None or other.text is None or "reply_markup" in self.kwargs:
+            return False
+        if self.group is None or other.group != self.group:
+            return False
+        other_kwargs = {k: v for k, v in other.kwargs.items() if k != "reply_markup"}
+        if other_kwargs != self.kwargs:
+            return False
+        return length + len(COALESCE_SEPARATOR) + len(other.text) <= MAX_MESSAGE_LENGTH
+
+
+@dataclass
+class _Chat:
+    bucket: TokenBucket
+    items: Deque[_Item] = field(default_factory=deque)
+    blocked_until: float = 0.0
+    scheduled: bool = False
+    last_active: float = field(default_factory=time.monotonic)
+
+
+class SendQueue:
+    """Очередь с FIFO на каждый чат и общим пулом воркеров.
+
+    Сообщения одного чата уходят по порядку и не чаще per_chat_rate в
+    секунду, все вместе — не чаще global_rate. Текстовые сообщения одной
+    группы, скопившиеся в очереди чата, уходят одним sendMessage. На
+    TelegramRetryAfter чат ставится на паузу, а сообщения — обратно
+    в начало его очереди.
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = 30.0, per_chat_rate: float = 1.0,
+                 workers: int = 4, max_retries: int = 3):
+        self.bot = bot
+        self.per_chat_rate = per_chat_rate
+        self.workers = workers
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, _Chat] = {}
+        self._ready: "asyncio.Queue[int]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "enqueued": 0, "sent": 0, "api_calls": 0, "coalesced": 0,
+            "retry_after": 0, "errors": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+        }
+
+    def _enqueue(self, chat_id: int, item: _Item) -> asyncio.Future:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(TokenBucket(self.per_chat_rate, 1))
+        chat.items.append(item)
+        chat.last_active = time.monotonic()
+        self.stats["enqueued"] += 1
+        self._schedule(chat_id, chat)
+        return item.future
+
+    def submit_call(self, chat_id: int, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Поставить произвольный вызов Bot API для чата; результат — в future"""
+        future = asyncio.get_running_loop().create_future()
+        return self._enqueue(chat_id, _Item(future, call=call))
+
+    def submit(self, chat_id: int, text: str, group: Optional[Hashable] = None, **kwargs) -> asyncio.Future:
+        """Поставить sendMessage в очередь; результат (Message) — в future.
+
+        Сообщения с одинаковым group, стоящие в очереди подряд, могут уйти
+        одним sendMessage; без group сообщение всегда уходит отдельно.
+        """
+        future = asyncio.get_running_loop().create_future()
+        return self._enqueue(chat_id, _Item(future, text=text, kwargs=kwargs, group=group))
+
+    def _schedule(self, chat_id: int, chat: _Chat, delay: float = 0.0):
+        if chat.scheduled:
+            return
+        chat.scheduled = True
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    @staticmethod
+    def _take_group(chat: _Chat) -> List[_Item]:
+        group = [chat.items.popleft()]
+        length = len(group[0].text or "")
+        while chat.items and group[-1].can_append(chat.items[0], length):
+            item = chat.items.popleft()
+            length += len(COALESCE_SEPARATOR) + len(item.text)
+            group.append(item)
+        return group
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                continue
+            # Пока чат в работе, scheduled остается True: второй воркер
+            # его не возьмет, и порядок сообщений сохраняется
+            if not chat.items:
+                chat.scheduled = False
+                continue
+
+            # Чат еще не готов — вернемся к нему позже, воркер не простаивает
+            delay = max(chat.blocked_until - time.monotonic(), chat.bucket.wait_time())
+            if delay > 0:
+                chat.scheduled = False
+                self._schedule(chat_id, chat, delay)
+                continue
+            global_delay = self._global.wait_time()
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+            self._global.take()
+            chat.bucket.take()
+
+            await self._send(chat_id, chat, self._take_group(chat))
+            chat.last_active = time.monotonic()
+            chat.scheduled = False
+            if chat.items:
+                self._schedule(chat_id, chat)
+
+    async def _send(self, chat_id: int, chat: _Chat, group: List[_Item]):
+        group = [item for item in group if not item.future.cancelled()]
+        if not group:
+            return
+        first = group[0]
+        self.stats["api_calls"] += 1
+        try:
+            if first.call is not None:
+                result = await first.call()
+            else:
+                text = COALESCE_SEPARATOR.join(item.text for item in group)
+                result = await self.bot.send_message(chat_id, text, **group[-1].kwargs)
+        except TelegramRetryAfter as e:
+            self.stats["retry_after"] += 1
+            log.warning(f"Flood control для чата {chat_id}: пауза {e.retry_after} с")
+            chat.blocked_until = time.monotonic() + e.retry_after
+            if first.attempts < self.max_retries:
+                for item in group:
+                    item.attempts += 1
+                chat.items.extendleft(reversed(group))
+                return
+            self._fail(group, e)
+        except TelegramForbiddenError as e:
+            # Пользователь заблокировал бота — повторять бессмысленно
+            log.info(f"Чат {chat_id} недоступен: {e}")
+            self._fail(group, e)
+        except Exception as e:
+            log.warning(f"Ошибка отправки в чат {chat_id}: {e}")
+            self._fail(group, e)
+        else:
+            now = time.monotonic()
+            self.stats["sent"] += len(group)
+            self.stats["coalesced"] += len(group) - 1
+            for item in group:
+                wait = now - item.enqueued_at
+                self.stats["wait_seconds_total"] += wait
+                self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], wait)
+                item.future.set_result(result)
+
+    def _fail(self, group: List[_Item], error: Exception):
+        self.stats["errors"] += len(group)
+        for item in group:
+            item.future.set_exception(error)
+
+    def depth(self) -> int:
+        """Сколько сообщений ждет отправки во всех чатах"""
+        return sum(len(chat.items) for chat in self._chats.values())
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        now = time.monotonic()
+        stats["depth"] = self.depth()
+        stats["chats"] = len(self._chats)
+        stats["oldest_wait_seconds"] = round(max(
+            (now - chat.items[0].enqueued_at for chat in self._chats.values() if chat.items), default=0.0
+        ), 3)
+        stats["wait_seconds_avg"] = round(stats["wait_seconds_total"] / stats["sent"], 4) if stats["sent"] else 0.0
+        return stats
+
+    def _prune(self, idle: float = 60.0):
+        now = time.monotonic()
+        for chat_id in [cid for cid, c in self._chats.items()
+                        if not c.items and not c.scheduled and now - c.last_active > idle]:
+            del self._chats[chat_id]
+
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(60)
+            self._prune()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(), name=f"send-worker-{i}") for i in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._janitor(), name="send-janitor"))
+
+    async def stop(self, timeout: float = 5.0):
+        """Дождаться отправки накопленного (не дольше timeout) и остановить воркеры"""
+        pending = [item.future for chat in self._chats.values() for item in chat.items]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def consume_result(future: asyncio.Future):
+    """done-callback для отправок, результат которых никто не ждет"""
+    # Ошибки отправки уже залогированы очередью
+    if not future.cancelled():
+        future.exception()
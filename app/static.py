@@ -0,0 +1,113 @@
+# Статика Mini App: пути относительно модуля, сжатие заранее,
+# content-hash URL для app.js/style.css и ETag/304.
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from payloads import etag_matches
+
+try:
+    import brotli
+except ImportError:  # есть в requirements.txt; без него (локальный запуск) отдаем только gzip
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+WEBAPP_DIR = Path(__file__).resolve().parent / "webapp"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Мелкие файлы сжимать нет смысла
+MIN_COMPRESS_SIZE = 512
+
+
+@dataclass
+class Asset:
+    body: bytes
+    media_type: str
+    cache_control: str
+    digest: str
+    variants: Dict[str, bytes] = field(default_factory=dict)  # encoding -> body
+
+    def etag(self, encoding: Optional[str]) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def _choose_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in available and encoding in accepted:
+            return encoding
+    return None
+
+
+class StaticAssets:
+    def __init__(self, root: Path = WEBAPP_DIR, fingerprinted: Iterable[str] = ("app.js", "style.css")):
+        self.root = root
+        self.fingerprinted = tuple(fingerprinted)
+        self._assets: Dict[str, Asset] = {}
+        # Исходное имя -> URL с хешем содержимого
+        self.urls: Dict[str, str] = {}
+
+    @staticmethod
+    def _build(body: bytes, media_type: str, cache_control: str) -> Asset:
+        asset = Asset(body, media_type, cache_control, hashlib.sha256(body).hexdigest()[:16])
+        if len(body) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                asset.variants["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    asset.variants["br"] = compressed
+        return asset
+
+    @staticmethod
+    def _media_type(name: str) -> str:
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type.endswith("javascript"):
+            media_type += "; charset=utf-8"
+        return media_type
+
+    def load(self):
+        """Прочитать файлы с диска и подготовить все варианты ответов"""
+        assets: Dict[str, Asset] = {}
+        urls: Dict[str, str] = {}
+        for name in self.fingerprinted:
+            body = (self.root / name).read_bytes()
+            asset = self._build(body, self._media_type(name), REVALIDATE)
+            stem, _, ext = name.rpartition(".")
+            hashed_name = f"{stem}.{asset.digest[:10]}.{ext}"
+            # Старые пути /app.js и /style.css остаются для уже открытых клиентов
+            assets[name] = asset
+            assets[f"static/{hashed_name}"] = self._build(body, asset.media_type, IMMUTABLE)
+            urls[name] = f"/static/{hashed_name}"
+
+        index = (self.root / "index.html").read_text(encoding="utf-8")
+        for name, url in urls.items():
+            index = index.replace(f'"/{name}"', f'"{url}"')
+        assets["index.html"] = self._build(index.encode("utf-8"), self._media_type("index.html"), REVALIDATE)
+
+        self._assets = assets
+        self.urls = urls
+        log.info(f"📦 Статика подготовлена: {', '.join(urls.values())}")
+
+    def response(self, name: str, request: Request) -> Response:
+        asset = self._assets.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""), asset.variants)
+        etag = asset.etag(encoding)
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=asset.variants[encoding], media_type=asset.media_type, headers=headers)
+        return Response(content=asset.body, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,205 @@
+# Хранилище пользовательских данных: избранное, уведомления, настройки.
+# Чтения обслуживаются из памяти, изменения копятся и пишутся пачками.
+import asyncio
+import json
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "ludic.db"
+
+Favorites = Dict[int, List[str]]
+Notifications = Dict[int, bool]
+Settings = Dict[int, Dict]
+
+
+class StorageBackend(ABC):
+    """Интерфейс долговременного хранилища для UserRepository"""
+
+    @abstractmethod
+    def load_all(self) -> Tuple[Favorites, Notifications, Settings]:
+        ...
+
+    @abstractmethod
+    def write_batch(self, favorites: Favorites, notifications: Notifications, settings: Settings):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Все обращения идут из потоков-исполнителей по одному за раз
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS user_favorites (
+                user_id INTEGER PRIMARY KEY,
+                teams TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS user_notifications (
+                user_id INTEGER PRIMARY KEY,
+                enabled INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS user_settings (
+                user_id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def load_all(self) -> Tuple[Favorites, Notifications, Settings]:
+        if self._conn is None:
+            self._connect()
+        favorites = {uid: json.loads(teams) for uid, teams in self._conn.execute("SELECT user_id, teams FROM user_favorites")}
+        notifications = {uid: bool(enabled) for uid, enabled in self._conn.execute("SELECT user_id, enabled FROM user_notifications")}
+        settings = {uid: json.loads(data) for uid, data in self._conn.execute("SELECT user_id, data FROM user_settings")}
+        return favorites, notifications, settings
+
+    def write_batch(self, favorites: Favorites, notifications: Notifications, settings: Settings):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_favorites (user_id, teams) VALUES (?, ?)",
+                [(uid, json.dumps(teams, ensure_ascii=False)) for uid, teams in favorites.items()],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_notifications (user_id, enabled) VALUES (?, ?)",
+                [(uid, int(enabled)) for uid, enabled in notifications.items()],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO user_settings (user_id, data) VALUES (?, ?)",
+                [(uid, json.dumps(data, ensure_ascii=False)) for uid, data in settings.items()],
+            )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class UserRepository:
+    """Данные пользователей в памяти с пакетной записью в StorageBackend.
+
+    Изменения сразу видны в памяти, а на диск уходят раз в flush_interval
+    секунд или как только накопится batch_size измененных записей.
+
+    Писатель должен быть один: данные читаются в память один раз на
+    старте, а записи целиком перезаписывают строки (INSERT OR REPLACE),
+    поэтому второй процесс на том же файле молча затирал бы чужие изменения.
+    """
+
+    def __init__(self, backend: StorageBackend, flush_interval: float = 2.0, batch_size: int = 100):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._favorites: Favorites = {}
+        self._notifications: Notifications = {}
+        self._settings: Settings = {}
+        self._dirty_favorites: Set[int] = set()
+        self._dirty_notifications: Set[int] = set()
+        self._dirty_settings: Set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    # --- ЧТЕНИЕ ---
+    def get_favorites(self, user_id: int) -> List[str]:
+        return list(self._favorites.get(user_id, []))
+
+    def get_notifications(self, user_id: int) -> bool:
+        return self._notifications.get(user_id, False)
+
+    def get_settings(self, user_id: int) -> Dict:
+        return dict(self._settings.get(user_id, {}))
+
+    def all_favorites(self) -> Favorites:
+        return self._favorites
+
+    # --- ИЗМЕНЕНИЕ ---
+    def add_favorite(self, user_id: int, team: str) -> bool:
+        """Добавить команду; False, если она уже в избранном"""
+        teams = self._favorites.setdefault(user_id, [])
+        if team in teams:
+            return False
+        teams.append(team)
+        self._mark(self._dirty_favorites, user_id)
+        return True
+
+    def set_notifications(self, user_id: int, enabled: bool):
+        self._notifications[user_id] = enabled
+        self._mark(self._dirty_notifications, user_id)
+
+    def set_settings(self, user_id: int, settings: Dict):
+        self._settings[user_id] = dict(settings)
+        self._mark(self._dirty_settings, user_id)
+
+    def _mark(self, dirty: Set[int], user_id: int):
+        dirty.add(user_id)
+        if self._pending() >= self.batch_size:
+            self._flush_now.set()
+
+    def _pending(self) -> int:
+        return len(self._dirty_favorites) + len(self._dirty_notifications) + len(self._dirty_settings)
+
+    # --- ЖИЗНЕННЫЙ ЦИКЛ ---
+    async def start(self):
+        favorites, notifications, settings = await asyncio.to_thread(self.backend.load_all)
+        self._favorites.update(favorites)
+        self._notifications.update(notifications)
+        self._settings.update(settings)
+        self._task = asyncio.create_task(self._run(), name="user-storage-flush")
+        log.info(f"💾 Загружены данные {len(set(favorites) | set(notifications) | set(settings))} пользователей")
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending():
+                return
+            # Снимок изменений делаем синхронно, чтобы не потерять новые правки
+            favorites = {uid: list(self._favorites.get(uid, [])) for uid in self._dirty_favorites}
+            notifications = {uid: self._notifications[uid] for uid in self._dirty_notifications}
+            settings = {uid: dict(self._settings[uid]) for uid in self._dirty_settings}
+            self._dirty_favorites.clear()
+            self._dirty_notifications.clear()
+            self._dirty_settings.clear()
+            try:
+                await asyncio.to_thread(self.backend.write_batch, favorites, notifications, settings)
+            except Exception:
+                log.exception("Ошибка записи пользовательских данных, повторим позже")
+                self._dirty_favorites.update(favorites)
+                self._dirty_notifications.update(notifications)
+                self._dirty_settings.update(settings)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def close(self):
+        # Задачу не отменяем: отмена посреди to_thread оставила бы запись
+        # идти в потоке, пока ниже закрывается соединение. Просим ее
+        # завершиться после текущей записи и дожидаемся
+        if self._task is not None:
+            self._closing = True
+            self._flush_now.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        await asyncio.to_thread(self.backend.close)
@@ -0,0 +1,239 @@
+# Поиск команд по названию без обращений к API-Sport.
+# Названия из снимков матчей, таблиц и статистики приводятся к одному
+# латинскому ключу (кириллица транслитерируется), поиск идет по
+# префиксам слов и по триграммам.
+import asyncio
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+# Служебные слова, которые пользователи обычно не пишут
+_STOP_WORDS = {"fc", "fk", "cf", "afc", "sc", "ac"}
+
+# Народные названия -> название, под которым команда приходит в данных
+TEAM_ALIASES = {
+    "реал": "Реал Мадрид",
+    "барса": "Барселона",
+    "атлетико": "Атлетико Мадрид",
+    "ман сити": "Манчестер Сити",
+    "сити": "Манчестер Сити",
+    "ман юнайтед": "Манчестер Юнайтед",
+    "мю": "Манчестер Юнайтед",
+    "юнайтед": "Манчестер Юнайтед",
+    "шпоры": "Тоттенхэм",
+    "псж": "ПСЖ",
+    "бавария": "Бавария",
+}
+
+# Порог похожести: ниже — не предлагаем, выше RESOLVE — считаем совпадением
+MIN_SCORE = 0.3
+RESOLVE_SCORE = 0.5
+# Матчей снимка за один шаг индексации, между шагами работает event loop
+SNAPSHOT_CHUNK = 100
+
+
+_TRANSLIT_TABLE = str.maketrans(_TRANSLIT)
+# Блоки комбинируемых диакритических знаков (после NFKD)
+_COMBINING = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_NOT_ALNUM = re.compile(r"[\W_]+")
+
+
+def search_key(name: str) -> str:
+    """Латинский ключ: регистр, диакритика, пунктуация и ФК/FC не важны"""
+    text = _COMBINING.sub("", unicodedata.normalize("NFKD", name.casefold()))
+    words = _NOT_ALNUM.sub(" ", text.translate(_TRANSLIT_TABLE)).split()
+    return " ".join(w for w in words if w not in _STOP_WORDS)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class TeamEntry:
+    name: str
+    team_id: Optional[int] = None
+    aliases: Set[str] = field(default_factory=set)
+    # Турнир из снимка: различает одноименные команды в подсказках
+    tournament: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class TeamHit:
+    team: TeamEntry
+    score: float
+
+
+class TeamIndex:
+    """Ключ записи — search_key названия. Одноименная команда с другим id
+    хранится под ключом «ключ#id» и находится по тем же словам и триграммам."""
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        self._entries: Dict[str, TeamEntry] = {}      # ключ записи -> команда
+        self._by_id: Dict[int, str] = {}
+        self._same_name: Dict[str, List[str]] = {}  # search_key -> ключи одноименных записей
+        self._seen: Set[Tuple[str, Optional[int]]] = set()  # уже учтенные (название, id)
+        self._trigrams: Dict[str, Set[str]] = {}     # триграмма -> ключи
+        self._trigram_count: Dict[str, int] = {}
+        self._tokens: List[Tuple[str, str]] = []     # (слово или ключ целиком, ключ), отсортировано
+        self._aliases: Dict[str, str] = {}           # ключ псевдонима -> ключ названия
+        for alias, name in (aliases or {}).items():
+            self.add_alias(alias, name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_alias(self, alias: str, name: str):
+        self._aliases[search_key(alias)] = search_key(name)
+
+    def add(self, name: str, team_id: Optional[int] = None, tournament: Optional[str] = None) -> bool:
+        """Добавить команду; True, если она новая"""
+        tokens: List[Tuple[str, str]] = []
+        added = self._add(name, team_id, tournament, tokens)
+        self._merge_tokens(tokens)
+        return added
+
+    def _add(self, name: str, team_id: Optional[int], tournament: Optional[str],
+             tokens: List[Tuple[str, str]]) -> bool:
+        # Снимки приходят каждые несколько секунд с теми же командами:
+        # повторную пару (название, id) не транслитерируем заново
+        if (name, team_id) in self._seen:
+            return False
+        self._seen.add((name, team_id))
+        key = search_key(name)
+        if not key:
+            return False
+        if team_id is not None and team_id in self._by_id:
+            entry_key = self._by_id[team_id]
+            if key != search_key(self._entries[entry_key].name) and key not in self._entries:
+                # Другое написание той же команды ищется как псевдоним
+                self._entries[entry_key].aliases.add(name)
+                self._aliases[key] = entry_key
+            return False
+        entry = self._entries.get(key)
+        if entry is not None:
+            if team_id is None or entry.team_id == team_id:
+                return False
+            if entry.team_id is None:
+                # Название из матчей точнее заготовленного
+                entry.team_id = team_id
+                entry.name = name
+                entry.tournament = tournament
+                self._by_id[team_id] = key
+                return False
+            # Одноименная команда с другим id — отдельная запись
+            entry_key = f"{key}#{team_id}"
+            self._same_name.setdefault(key, [key]).append(entry_key)
+        else:
+            entry_key = key
+
+        self._entries[entry_key] = TeamEntry(name, team_id, tournament=tournament)
+        if team_id is not None:
+            self._by_id[team_id] = entry_key
+        trigrams = _trigrams(key)
+        self._trigram_count[entry_key] = len(trigrams)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(entry_key)
+        tokens.extend((token, entry_key) for token in {key, *key.split()})
+        return True
+
+    def _merge_tokens(self, tokens: List[Tuple[str, str]]):
+        if len(tokens) <= 4:
+            for token in tokens:
+                insort(self._tokens, token)
+        elif tokens:
+            # Вставка по одному — квадратичная на тысячах новых команд
+            self._tokens.extend(tokens)
+            self._tokens.sort()
+
+    def add_many(self, names: Iterable[str]) -> int:
+        tokens: List[Tuple[str, str]] = []
+        added = sum(self._add(name, None, None, tokens) for name in names)
+        self._merge_tokens(tokens)
+        return added
+
+    async def on_snapshot(self, snapshot) -> int:
+        """Дополнить индекс командами из нового снимка матчей.
+
+        Уже известные команды пропускаются без транслитерации. Первый снимок
+        (тысячи новых команд) индексируется частями, отдавая управление
+        event loop между ними.
+        """
+        added = 0
+        matches = snapshot.matches
+        for start in range(0, len(matches), SNAPSHOT_CHUNK):
+            tokens: List[Tuple[str, str]] = []
+            for match in matches[start:start + SNAPSHOT_CHUNK]:
+                added += self._add(match.home_name, match.home_id, match.tournament_name, tokens)
+                added += self._add(match.away_name, match.away_id, match.tournament_name, tokens)
+            self._merge_tokens(tokens)
+            if tokens and start + SNAPSHOT_CHUNK < len(matches):
+                await asyncio.sleep(0)
+        return added
+
+    def keys_for(self, name: str, team_id: Optional[int] = None) -> Set[str]:
+        """Ключи команды из матча: по названию и по id, если он уже в индексе"""
+        keys = {search_key(name)}
+        if team_id is not None and team_id in self._by_id:
+            keys.add(self._by_id[team_id])
+        return keys
+
+    def get(self, team_id: int) -> Optional[TeamEntry]:
+        key = self._by_id.get(team_id)
+        return self._entries.get(key) if key else None
+
+    def _prefix_keys(self, query: str) -> Set[str]:
+        keys = set()
+        i = bisect_left(self._tokens, (query, ""))
+        while i < len(self._tokens) and self._tokens[i][0].startswith(query):
+            keys.add(self._tokens[i][1])
+            i += 1
+        return keys
+
+    def search(self, query: str, limit: int = 5) -> List[TeamHit]:
+        key = search_key(query)
+        if not key:
+            return []
+        scores: Dict[str, float] = {}
+        for exact in (self._aliases.get(key), key):
+            if exact in self._entries:
+                for entry_key in self._same_name.get(exact, (exact,)):
+                    scores[entry_key] = 1.0
+        for entry_key in self._prefix_keys(key):
+            scores.setdefault(entry_key, 0.9)
+
+        query_trigrams = _trigrams(key)
+        shared = Counter()
+        for trigram in query_trigrams:
+            for entry_key in self._trigrams.get(trigram, ()):
+                shared[entry_key] += 1
+        for entry_key, common in shared.items():
+            similarity = common / (len(query_trigrams) + self._trigram_count[entry_key] - common)
+            if similarity >= MIN_SCORE and similarity > scores.get(entry_key, 0):
+                scores[entry_key] = similarity
+
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], self._entries[kv[0]].name))[:limit]
+        return [TeamHit(self._entries[k], round(score, 3)) for k, score in best]
+
+    def resolve(self, query: str) -> Optional[TeamEntry]:
+        """Единственная подходящая команда или None"""
+        hits = self.search(query, limit=2)
+        if not hits or hits[0].score < RESOLVE_SCORE:
+            return None
+        # Две одинаково похожие команды — угадывать не беремся. Точное
+        # совпадение выигрывает, если это не две одноименные команды
+        if len(hits) > 1 and hits[1].score == hits[0].score and (
+                hits[0].score < 1.0 or hits[0].team.name == hits[1].team.name):
+            return None
+        return hits[0].team
@@ -0,0 +1,148 @@
+# Защита обработчиков от частых нажатий: лимит на пользователя,
+# отбрасывание повторных нажатий кнопок и присоединение к уже
+# выполняющейся такой же команде.
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from sender import TokenBucket, consume_result
+
+log = logging.getLogger(__name__)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer-middleware для сообщений и callback-запросов.
+
+    Одинаковое действие пользователя (текст команды или callback_data),
+    пока оно выполняется, повторно не запускается: второй вызов ждет
+    результата первого. Повтор кнопки в пределах duplicate_window после
+    завершения отбрасывается, сверх rate/burst — тоже. Отброшенным
+    callback-запросам сразу отвечаем, чтобы у кнопки пропали часики.
+    Память ограничена max_users корзинами и max_users недавними нажатиями.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 5, duplicate_window: float = 1.0,
+                 max_users: int = 10000, idle_ttl: float = 600.0):
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_window = duplicate_window
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._recent: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"passed": 0, "attached": 0, "duplicates": 0, "throttled": 0}
+
+    @staticmethod
+    def _key(user_id: int, chat_id: Optional[int], event: TelegramObject) -> Optional[Hashable]:
+        # Чат в ключе: та же команда в группе и в личке — разные действия
+        if isinstance(event, CallbackQuery) and event.data:
+            return user_id, "callback", chat_id, event.data
+        if isinstance(event, Message) and event.text:
+            return user_id, "message", chat_id, event.text.strip()
+        return None
+
+    def _bucket(self, user_id: int, now: float) -> TokenBucket:
+        # Корзины упорядочены по последнему обращению: старые — в начале
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if len(self._buckets) < self.max_users and now - oldest.updated <= self.idle_ttl:
+                break
+            self._buckets.popitem(last=False)
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+        self._buckets.move_to_end(user_id)
+        return bucket
+
+    def _prune_recent(self, now: float):
+        # Записи упорядочены по времени завершения: старые — в начале
+        while self._recent:
+            if len(self._recent) < self.max_users and now - next(iter(self._recent.values())) <= self.duplicate_window:
+                break
+            self._recent.popitem(last=False)
+
+    def _is_duplicate(self, key: Hashable, now: float) -> bool:
+        self._prune_recent(now)
+        return key in self._recent
+
+    def _finish(self, key: Hashable):
+        self._inflight.pop(key, None)
+        # Повторы отбрасываются только для кнопок, сообщения не запоминаем
+        if key[1] != "callback":
+            return
+        now = time.monotonic()
+        self._recent.pop(key, None)
+        self._prune_recent(now)
+        self._recent[key] = now
+
+    @staticmethod
+    async def _answer(event: TelegramObject, text: Optional[str] = None):
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer(text)
+            except TelegramAPIError as e:
+                log.debug(f"Не удалось ответить на callback: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        key = self._key(user.id, chat.id if chat else None, event) if user else None
+        if key is None:
+            return await handler(event, data)
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["attached"] += 1
+            await self._answer(event, "⏳ Уже выполняется...")
+            return await asyncio.shield(pending)
+
+        now = time.monotonic()
+        if isinstance(event, CallbackQuery) and self._is_duplicate(key, now):
+            self.stats["duplicates"] += 1
+            await self._answer(event)
+            return None
+
+        bucket = self._bucket(user.id, now)
+        if bucket.wait_time() > 0:
+            self.stats["throttled"] += 1
+            log.info(f"🐢 Отброшено действие пользователя {user.id} сверх лимита: {key[1]} {key[3][:64]!r}")
+            await self._answer(event, "🐢 Слишком часто, подождите немного")
+            return None
+        bucket.take()
+
+        self.stats["passed"] += 1
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(consume_result)
+        self._inflight[key] = future
+        try:
+            result = await handler(event, data)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["users"] = len(self._buckets)
+        stats["inflight"] = len(self._inflight)
+        stats["recent"] = len(self._recent)
+        return stats
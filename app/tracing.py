@@ -0,0 +1,162 @@
+# Трассировка запросов: вложенные спаны через contextvars.
+# Спан записывается, только если идет трассировка (корень открыт
+# middleware); иначе span() почти ничего не стоит. Запросы дольше
+# порога выводятся в лог деревом спанов.
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+log = logging.getLogger(__name__)
+
+# Больше дочерних спанов у одного родителя не храним (например, карточки длинного списка)
+MAX_CHILDREN = 50
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "dropped", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self.dropped = 0
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        _current.reset(self._token)
+
+    def render(self, depth: int = 0) -> List[str]:
+        attrs = "".join(f" {k}={v}" for k, v in self.attrs.items())
+        lines = [f"{'  ' * depth}{self.name} {self.duration_ms:.1f} мс{attrs}"]
+        for child in self.children:
+            lines.extend(child.render(depth + 1))
+        if self.dropped:
+            lines.append(f"{'  ' * (depth + 1)}… еще {self.dropped} спанов")
+        return lines
+
+
+class _NullSpan:
+    """Спан вне трассировки: ничего не записывает"""
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL = _NullSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def span(name: str, **attrs: Any):
+    """with span("имя"): ... — дочерний спан текущей трассировки или no-op"""
+    parent = _current.get()
+    if parent is None:
+        return _NULL
+    child = Span(name, attrs)
+    if len(parent.children) < MAX_CHILDREN:
+        parent.children.append(child)
+    else:
+        parent.dropped += 1
+    return child
+
+
+class Tracer:
+    """Открывает корневые спаны и логирует медленные трассировки.
+
+    threshold_ms <= 0 выключает трассировку целиком.
+    """
+
+    def __init__(self, threshold_ms: float = 1000.0):
+        self.threshold_ms = threshold_ms
+        self.stats = {"traces": 0, "slow": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self, name: str, **attrs: Any) -> Span:
+        return Span(name, attrs)
+
+    def finish(self, root: Span):
+        if root.end is not None:
+            return
+        root.end = time.perf_counter()
+        self.stats["traces"] += 1
+        if root.duration_ms >= self.threshold_ms:
+            self.stats["slow"] += 1
+            log.warning("🐢 Медленный запрос:\n" + "\n".join(root.render()))
+
+
+class TraceMiddleware(BaseMiddleware):
+    """Inner-middleware aiogram: корневой спан на каждый вызов обработчика"""
+
+    def __init__(self, tracer: Tracer,
+                 name: Optional[Callable[[TelegramObject, Dict[str, Any]], Optional[str]]] = None):
+        self.tracer = tracer
+        self.name = name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.tracer.enabled:
+            return await handler(event, data)
+        name = (self.name and self.name(event, data)) or data["handler"].callback.__name__
+        root = self.tracer.start(name)
+        token = _current.set(root)
+        try:
+            return await handler(event, data)
+        finally:
+            _current.reset(token)
+            self.tracer.finish(root)
+
+
+class TraceRequests:
+    """ASGI-middleware: корневой спан на HTTP-запрос до заголовков ответа"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        root = self.tracer.start(f"{scope['method']} {scope['path']}")
+        token = _current.set(root)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.set(status=message["status"])
+                self.tracer.finish(root)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            _current.reset(token)
+            self.tracer.finish(root)
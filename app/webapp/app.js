@@ -41,73 +41,204 @@
     }, 5000);
   }
 
-  async function loadMatches(){
-    matchesEl.innerHTML = '⏳ Загрузка...';
-    try{
-      // Получаем initData для проверки авторизации
-      const initData = getInitData();
-      
-      const resp = await fetch('/api/matches', {
-        headers: {
-          'X-Telegram-Init-Data': initData
-        }
-      });
-      
-      if(!resp.ok) {
-        if (resp.status === 401) {
-          throw new Error('Ошибка авторизации. Пожалуйста, откройте приложение через Telegram.');
-        }
-        throw new Error('Network response not ok');
+  // Карточки матчей по ключу: обновления патчат их на месте, без перерисовки списка
+  const cards = new Map();
+  let stream = null;
+  let reconnectTimer = null;
+  let retryMs = 3000;
+
+  // Поддерживаются оба формата: API-Sport (tournament/homeTeam/homeScore)
+  // и старый (league/teams/scores)
+  function matchFields(m) {
+    const pick = (...values) => values.find(v => v !== undefined && v !== null);
+    const homeScore = pick(m.homeScore && m.homeScore.current, m.scores && m.scores.home);
+    const awayScore = pick(m.awayScore && m.awayScore.current, m.scores && m.scores.away);
+    let time = m.time || '';
+    if (m.startTimestamp) {
+      time = new Date(m.startTimestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+    }
+    if (m.status === 'inprogress') {
+      time = '🔴 LIVE';
+    } else if (m.status === 'finished') {
+      time = '🏁 Завершен';
+    }
+    return {
+      league: pick(m.tournament && m.tournament.name, m.league && m.league.name) || '—',
+      vs: `⚽ ${pick(m.homeTeam && m.homeTeam.name, m.teams && m.teams.home && m.teams.home.name) || 'Home'}`
+        + ` — ${pick(m.awayTeam && m.awayTeam.name, m.teams && m.teams.away && m.teams.away.name) || 'Away'}`,
+      score: (homeScore !== undefined && awayScore !== undefined) ? `${homeScore} - ${awayScore}` : '',
+      time: `🕒 ${time}`,
+    };
+  }
+
+  function createCard() {
+    const card = document.createElement('div');
+    card.className = 'match';
+    for (const name of ['league', 'vs', 'score', 'time']) {
+      const el = document.createElement('div');
+      el.className = name;
+      card.appendChild(el);
+    }
+    return card;
+  }
+
+  // textContent вместо innerHTML: названия команд приходят от провайдера
+  function patchCard(card, m) {
+    const fields = matchFields(m);
+    for (const name in fields) {
+      const el = card.querySelector('.' + name);
+      if (el.textContent !== fields[name]) {
+        el.textContent = fields[name];
       }
-      
-      const data = await resp.json();
-      const matches = data.data || [];
-      
-      if(matches.length === 0){
-        matchesEl.innerHTML = '<div class="match">⚽ Нет матчей в ближайшие 2 часа</div>';
-        return;
+    }
+    card.querySelector('.score').hidden = !fields.score;
+  }
+
+  function showEmpty() {
+    matchesEl.innerHTML = '<div class="match">⚽ Нет матчей в ближайшие 2 часа</div>';
+  }
+
+  function upsert(key, m) {
+    let card = cards.get(key);
+    if (!card) {
+      if (cards.size === 0) {
+        matchesEl.innerHTML = '';
       }
-      
-      matchesEl.innerHTML = matches.map(m => {
-        const league = (m.league && m.league.name) || '—';
-        const home = (m.teams && m.teams.home && m.teams.home.name) || 'Home';
-        const away = (m.teams && m.teams.away && m.teams.away.name) || 'Away';
-        const time = m.time || '';
-        const scoreHome = m.scores && m.scores.home !== null ? m.scores.home : '';
-        const scoreAway = m.scores && m.scores.away !== null ? m.scores.away : '';
-        
-        const scoreText = (scoreHome !== '' && scoreAway !== '') 
-          ? `<div class="score">${scoreHome} - ${scoreAway}</div>` 
-          : '';
-        
-        return `
-          <div class="match">
-            <div class="league">${league}</div>
-            <div class="vs">⚽ ${home} — ${away}</div>
-            ${scoreText}
-            <div class="time">🕒 ${time}</div>
-          </div>
-        `;
-      }).join('');
-      
-      // Показываем уведомление об успешной загрузке
-      showNotification(`Загружено ${matches.length} матчей`);
-      
-    } catch(e) {
-      console.error('Error loading matches:', e);
-      let errorMessage = '❌ Ошибка при загрузке матчей';
-      
-      if (e.message.includes('авторизации')) {
-        errorMessage = '❌ ' + e.message;
+      card = createCard();
+      cards.set(key, card);
+      matchesEl.appendChild(card);
+    }
+    patchCard(card, m);
+  }
+
+  function remove(key) {
+    const card = cards.get(key);
+    if (card) {
+      card.remove();
+      cards.delete(key);
+    }
+    if (cards.size === 0) {
+      showEmpty();
+    }
+  }
+
+  function onSnapshot(event) {
+    const matches = JSON.parse(event.data).matches || [];
+    cards.clear();
+    matchesEl.innerHTML = '';
+    matches.forEach(item => upsert(item.key, item.match));
+    if (matches.length === 0) {
+      showEmpty();
+    }
+  }
+
+  function onUpdate(event) {
+    for (const e of JSON.parse(event.data).events || []) {
+      if (e.type === 'removed') {
+        remove(e.key);
+      } else {
+        upsert(e.key, e.match);
       }
-      
-      matchesEl.innerHTML = `<div class="match error">${errorMessage}</div>`;
-      showNotification(errorMessage, true);
     }
   }
 
+  function showError(errorMessage) {
+    matchesEl.innerHTML = `<div class="match error">${errorMessage}</div>`;
+    cards.clear();
+    showNotification(errorMessage, true);
+  }
+
+  // Один SSE-поток на открытое приложение: начальный список, затем только изменения.
+  // Поток читается через fetch, а не EventSource: initData уходит в заголовке,
+  // а не в URL, который попадает в логи. При обрыве переподключаемся и
+  // получаем список заново.
+  const handlers = {
+    snapshot: onSnapshot,
+    update: onUpdate,
+    rejected: (event) => {
+      stopStream();
+      showError('❌ ' + JSON.parse(event.data).error);
+    },
+  };
+
+  function dispatch(frame) {
+    let name = 'message';
+    const data = [];
+    for (const line of frame.split('\n')) {
+      if (line.startsWith('event:')) {
+        name = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        data.push(line.slice(5).replace(/^ /, ''));
+      } else if (line.startsWith('retry:')) {
+        retryMs = parseInt(line.slice(6), 10) || retryMs;
+      }
+    }
+    if (data.length && handlers[name]) {
+      handlers[name]({ data: data.join('\n') });
+    }
+  }
+
+  async function readStream(controller) {
+    const response = await fetch('/api/matches/stream', {
+      headers: { 'X-Telegram-Init-Data': getInitData(), 'Accept': 'text/event-stream' },
+      signal: controller.signal,
+    });
+    if (!response.ok) {
+      // 401/429 повторять бессмысленно
+      let error = 'Ошибка при загрузке матчей. Откройте приложение через Telegram заново.';
+      try {
+        error = (await response.json()).error || error;
+      } catch (e) {}
+      stopStream();
+      showError('❌ ' + error);
+      return;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true }).replace(/\r\n?/g, '\n');
+      let end;
+      while ((end = buffer.indexOf('\n\n')) >= 0) {
+        dispatch(buffer.slice(0, end));
+        buffer = buffer.slice(end + 2);
+      }
+    }
+  }
+
+  function stopStream() {
+    clearTimeout(reconnectTimer);
+    if (stream) {
+      stream.abort();
+      stream = null;
+    }
+  }
+
+  function openStream() {
+    stopStream();
+    const controller = new AbortController();
+    stream = controller;
+    readStream(controller).catch(() => {}).finally(() => {
+      // Поток оборвался сам, а не был закрыт нами — переподключаемся
+      if (stream === controller) {
+        stream = null;
+        reconnectTimer = setTimeout(openStream, retryMs);
+      }
+    });
+  }
+
+  function connect() {
+    matchesEl.innerHTML = '⏳ Загрузка...';
+    cards.clear();
+    openStream();
+  }
+
   // Обработчики событий
-  refreshBtn.addEventListener('click', loadMatches);
+  refreshBtn.addEventListener('click', connect);
   
   closeBtn.addEventListener('click', () => { 
     try { 
@@ -146,9 +277,6 @@
     }
     
     displayUserInfo();
-    loadMatches();
+    connect();
   });
-
-  // Initial load
-  loadMatches();
 })();
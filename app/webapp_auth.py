@@ -0,0 +1,77 @@
+# Проверка initData Telegram Mini App.
+# Секретный ключ вычисляется один раз, успешные проверки кэшируются.
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InitData:
+    auth_date: int
+    user: Dict[str, Any] = field(default_factory=dict)
+    query_id: Optional[str] = None
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.user.get("id")
+
+
+class InitDataValidator:
+    def __init__(self, bot_token: str, max_age: float = 86400, cache_size: int = 1024):
+        self._secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, InitData]" = OrderedDict()
+
+    def _fresh(self, data: InitData) -> bool:
+        return not self.max_age or time.time() - data.auth_date <= self.max_age
+
+    def _parse_and_verify(self, init_data: str) -> Optional[InitData]:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+        hash_value = fields.pop("hash", None)
+        if not hash_value:
+            return None
+
+        check_string = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+        calculated_hash = hmac.new(self._secret_key, check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(calculated_hash, hash_value):
+            return None
+
+        user = json.loads(fields["user"]) if fields.get("user") else {}
+        return InitData(
+            auth_date=int(fields.get("auth_date", 0)),
+            user=user,
+            query_id=fields.get("query_id"),
+        )
+
+    def validate(self, init_data: str) -> Optional[InitData]:
+        """Проверенные данные initData или None, если подпись неверна или устарела"""
+        if not init_data:
+            return None
+        key = hashlib.sha256(init_data.encode()).digest()
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+        else:
+            try:
+                data = self._parse_and_verify(init_data)
+            except Exception as e:
+                log.error(f"Ошибка проверки initData: {e}")
+                return None
+            if data is None:
+                return None
+            self._cache[key] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        if not self._fresh(data):
+            self._cache.pop(key, None)
+            return None
+        return data
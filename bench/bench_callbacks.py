@@ -0,0 +1,133 @@
+# Микробенчмарк маршрутизации callback-запросов.
+# Сравнивает цепочку фильтров aiogram (lambda c: c.data == ...) с одним
+# хендлером и словарем маршрутов CallbackRouter на ROUTES действиях.
+#
+#   python bench/bench_callbacks.py [--routes 60] [--updates 2000]
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+from callbacks import CallbackRouter, RouteMiddleware, pack  # noqa: E402
+
+BOT_TOKEN = "42:BENCH"
+
+
+def make_update(update_id: int, data: str) -> Update:
+    user = User(id=1, is_bot=False, first_name="bench")
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type="private"), text="menu")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=str(update_id), from_user=user, chat_instance="bench",
+                                     message=message, data=data),
+    )
+
+
+def build_filter_chain(routes: int) -> Dispatcher:
+    """Как было в main.py: по фильтру на кнопку, проверка по порядку регистрации"""
+    dp = Dispatcher()
+    router = Router()
+
+    def register(name):
+        @router.callback_query(lambda c, name=name: c.data == name)
+        async def handler(callback: CallbackQuery):
+            return name
+
+    def register_prefix(prefix):
+        @router.callback_query(lambda c, prefix=prefix: c.data.startswith(prefix))
+        async def handler(callback: CallbackQuery):
+            return callback.data[len(prefix):]
+
+    for i in range(routes - 2):
+        register(f"action_{i}")
+    register_prefix("league_")
+    register_prefix("table_")
+    dp.include_router(router)
+    return dp
+
+
+def build_router(routes: int):
+    dp = Dispatcher()
+    callback_router = CallbackRouter()
+
+    def register(i):
+        async def handler(callback: CallbackQuery):
+            return i
+        callback_router.register(f"a{i}", handler)
+
+    async def with_arg(callback: CallbackQuery, league_key: str):
+        return league_key
+
+    for i in range(routes - 2):
+        register(i)
+    callback_router.register("lg", with_arg, [("league_key", str)])
+    callback_router.register("tb", with_arg, [("league_key", str)])
+
+    # Как в main.py: маршрут ищется один раз в middleware
+    dp.callback_query.middleware(RouteMiddleware(callback_router))
+
+    @dp.callback_query()
+    async def process_callback(callback: CallbackQuery, callback_route=None):
+        await callback_router.dispatch(callback, callback_route)
+
+    return dp, callback_router
+
+
+async def run_feed(dp: Dispatcher, bot: Bot, updates) -> list:
+    timings = []
+    for update in updates:
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(name: str, timings: list):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{name:<34} mean {statistics.fmean(timings) * 1e6:8.1f} us   p50 {p50:8.1f} us   p99 {p99:8.1f} us")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", type=int, default=60)
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    bot = Bot(BOT_TOKEN)
+    chain = build_filter_chain(args.routes)
+    dp, callback_router = build_router(args.routes)
+    print(f"routes: {args.routes}, updates per case: {args.updates}")
+
+    middle = args.routes // 2
+    # (callback_data для цепочки фильтров, callback_data для CallbackRouter)
+    cases = {
+        "first route": ("action_0", pack("a0")),
+        "middle route": (f"action_{middle}", pack(f"a{middle}")),
+        "last route (prefix + arg)": ("table_premier_league", pack("tb", "premier_league")),
+    }
+
+    for case, (legacy_data, packed_data) in cases.items():
+        print(f"\n{case}")
+        summarize("  aiogram filter chain", await run_feed(
+            chain, bot, [make_update(i, legacy_data) for i in range(args.updates)]))
+        summarize("  CallbackRouter via feed_update", await run_feed(
+            dp, bot, [make_update(i, packed_data) for i in range(args.updates)]))
+        start = time.perf_counter()
+        for _ in range(args.updates):
+            callback_router.resolve(packed_data)
+        print(f"  CallbackRouter.resolve only        {(time.perf_counter() - start) / args.updates * 1e6:8.2f} us")
+
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+# Локальная замена API-Sport для нагрузочных тестов.
+# Отдает GET /v1/football/matches: сгенерированный (или записанный)
+# список матчей заданного размера с заданной задержкой и считает запросы.
+#
+#   python bench/fake_api_sport.py [--port 8081] [--matches 500] [--latency-ms 80] [--payload recorded.json]
+#   API_SPORT_BASE_URL=http://127.0.0.1:8081/v1/football python app/main.py
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+STATUSES = ("inprogress", "finished", "notstarted")
+# id 1-4 совпадают с POPULAR_LEAGUES бота
+TOURNAMENTS = [(i, f"League {i}") for i in range(1, 9)]
+
+
+def generate_matches(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Матчи в формате API-Sport: ~20% идут, ~10% завершены, остальные начнутся в ближайшие 6 часов"""
+    rnd = random.Random(seed)
+    now = int(time.time() * 1000)
+    matches = []
+    for i in range(count):
+        status = rnd.choices(STATUSES, weights=(2, 1, 7))[0]
+        tournament_id, tournament_name = TOURNAMENTS[i % len(TOURNAMENTS)]
+        home, away = 2 * i + 1, 2 * i + 2
+        if status == "notstarted":
+            start = now + rnd.randint(1, 6 * 60) * 60 * 1000
+        else:
+            start = now - rnd.randint(5, 110) * 60 * 1000
+        match = {
+            "id": 100000 + i,
+            "status": status,
+            "startTimestamp": start,
+            "tournament": {"id": tournament_id, "name": tournament_name},
+            "homeTeam": {"id": home, "name": f"Team {home}"},
+            "awayTeam": {"id": away, "name": f"Team {away}"},
+        }
+        if status != "notstarted":
+            match["homeScore"] = {"current": rnd.randint(0, 4)}
+            match["awayScore"] = {"current": rnd.randint(0, 4)}
+        matches.append(match)
+    return matches
+
+
+class FakeApiSport:
+    def __init__(self, matches: int = 500, latency_ms: float = 50.0, jitter_ms: float = 20.0,
+                 payload: Optional[List[Dict[str, Any]]] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.matches = payload if payload is not None else generate_matches(matches)
+        self.calls: Counter = Counter()
+
+    async def handle_matches(self, request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization"):
+            return web.json_response({"error": "unauthorized"}, status=401)
+        self.calls[request.path] += 1
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        matches = self.matches
+        q = request.query
+        if q.get("status"):
+            matches = [m for m in matches if m["status"] == q["status"]]
+        if q.get("tournament_id"):
+            matches = [m for m in matches if str(m["tournament"]["id"]) == q["tournament_id"]]
+        if q.get("team_id"):
+            matches = [m for m in matches if q["team_id"] in (str(m["homeTeam"]["id"]), str(m["awayTeam"]["id"]))]
+        return web.json_response({"matches": matches})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"calls": dict(self.calls), "total": sum(self.calls.values())})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/football/matches", self.handle_matches)
+        app.router.add_get("/_stats", self.handle_stats)
+        return app
+
+
+async def start(fake: FakeApiSport, port: int) -> web.AppRunner:
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def load_payload(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["matches"] if isinstance(data, dict) else data
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--matches", type=int, default=500, help="размер списка матчей (10-5000)")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--payload", help="записанный ответ /matches (JSON) вместо сгенерированного")
+
+
+def from_args(args) -> FakeApiSport:
+    payload = load_payload(args.payload) if args.payload else None
+    return FakeApiSport(args.matches, args.latency_ms, args.jitter_ms, payload)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    add_arguments(parser)
+    args = parser.parse_args()
+    fake = from_args(args)
+    await start(fake, args.port)
+    print(f"fake API-Sport: http://127.0.0.1:{args.port}/v1/football, matches: {len(fake.matches)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+# Локальная замена Telegram Bot API для нагрузочных тестов.
+# Отдает боту апдейты через getUpdates (long polling), принимает
+# sendMessage/editMessageText/answerCallbackQuery и остальные методы
+# и дает драйверу дождаться ответа бота в конкретный чат.
+#
+#   python bench/fake_telegram.py [--port 8082]
+#   TELEGRAM_API_BASE=http://127.0.0.1:8082 python app/main.py
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from aiohttp import web
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+# Методы, ответом на которые является сообщение
+MESSAGE_METHODS = {"sendMessage", "editMessageText"}
+
+Done = Callable[[str], bool]
+
+
+class FakeTelegram:
+    def __init__(self):
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._new_updates = asyncio.Event()
+        self._waiters: Dict[int, Tuple[asyncio.Future, Done]] = {}
+        self._message_id = 0
+        self.calls: Counter = Counter()
+        self.polls = 0
+
+    # --- сторона драйвера ---
+    def push(self, update: Dict[str, Any]) -> int:
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append({"update_id": update_id, **update})
+        self._new_updates.set()
+        return update_id
+
+    def expect(self, chat_id: int, done: Done = lambda text: True) -> asyncio.Future:
+        """Future, который завершится текстом первого подходящего сообщения бота в chat_id"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = (future, done)
+        return future
+
+    def cancel(self, chat_id: int):
+        self._waiters.pop(chat_id, None)
+
+    # --- сторона бота ---
+    async def _get_updates(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        self.polls += 1
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:int(params.get("limit") or 100)]
+
+    def _message(self, params: Dict[str, str]) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id") or 0)
+        text = params.get("text", "")
+        waiter = self._waiters.get(chat_id)
+        if waiter is not None and waiter[1](text):
+            del self._waiters[chat_id]
+            if not waiter[0].done():
+                waiter[0].set_result(text)
+        self._message_id += 1
+        return {
+            "message_id": int(params.get("message_id") or self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        if request.content_type == "application/json":
+            params = {k: v if isinstance(v, str) else json.dumps(v) for k, v in (await request.json()).items()}
+        else:
+            params = {k: v for k, v in (await request.post()).items() if isinstance(v, str)}
+        if method == "getUpdates":
+            result: Any = await self._get_updates(params)
+        elif method == "getMe":
+            result = BOT_USER
+        elif method in MESSAGE_METHODS:
+            result = self._message(params)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_inject(self, request: web.Request) -> web.Response:
+        return web.json_response({"update_id": self.push(await request.json())})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"calls": dict(self.calls), "pending_updates": len(self._updates)})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_post("/_inject", self.handle_inject)
+        app.router.add_get("/_stats", self.handle_stats)
+        return app
+
+
+async def start(fake: FakeTelegram, port: int) -> web.AppRunner:
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+    await start(FakeTelegram(), args.port)
+    print(f"fake Telegram Bot API: http://127.0.0.1:{args.port} (POST /_inject — положить апдейт)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,256 @@
+# Нагрузочный тест бота целиком на локальных заменах API-Sport и Telegram.
+# Запускает фейки в этом процессе, бота (app/main.py) — отдельным
+# процессом и гоняет синтетических пользователей по командам, кнопкам
+# меню и /api/matches Mini App. Печатает p50/p95/p99, пропускную
+# способность и число запросов к API-Sport.
+#
+#   python bench/load_test.py [--users 50] [--duration 30] [--matches 500] [--latency-ms 50]
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from callbacks import pack  # noqa: E402
+from fake_api_sport import add_arguments, from_args  # noqa: E402
+from fake_api_sport import start as start_api_sport  # noqa: E402
+from fake_telegram import FakeTelegram  # noqa: E402
+from fake_telegram import start as start_telegram  # noqa: E402
+
+BOT_TOKEN = "42:BENCH"
+WEBAPP_URL = "http://127.0.0.1:8080"
+
+
+class Scenario:
+    def __init__(self, name: str, weight: int, command: Optional[str] = None, callback: Optional[str] = None,
+                 done: Callable[[str], bool] = lambda text: True):
+        self.name = name
+        self.weight = weight
+        self.command = command
+        self.callback = callback
+        self.done = done
+
+
+SCENARIOS = [
+    Scenario("/matches", 5, command="/matches"),
+    Scenario("/live", 4, command="/live"),
+    # Сначала приходит «Кручу барабан...», ждем саму ставку
+    Scenario("/bet", 2, command="/bet", done=lambda text: "СЛУЧАЙНАЯ СТАВКА" in text or "Не нашел" in text),
+    Scenario("btn matches", 3, callback=pack("um")),
+    Scenario("btn live", 2, callback=pack("lv")),
+    Scenario("btn leagues", 1, callback=pack("lm")),
+    Scenario("btn league", 2, callback=pack("lg", "premier_league")),
+    Scenario("btn stats", 1, callback=pack("sm")),
+    Scenario("btn main menu", 1, callback=pack("m")),
+    Scenario("webapp /api/matches", 4),
+]
+
+
+def sign_init_data(user_id: int) -> str:
+    """initData, подписанный так же, как это делает Telegram"""
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id, "first_name": "bench"})}
+    check_string = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def message_update(user_id: int, text: str) -> dict:
+    return {"message": {
+        "message_id": random.randint(1, 10 ** 9), "date": int(time.time()), "text": text,
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else [],
+    }}
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {"callback_query": {
+        "id": str(random.randint(1, 10 ** 12)), "chat_instance": "bench", "data": data,
+        "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+        "message": {
+            "message_id": 1, "date": int(time.time()), "text": "menu",
+            "chat": {"id": user_id, "type": "private"},
+        },
+    }}
+
+
+class LoadDriver:
+    def __init__(self, telegram: FakeTelegram, http: aiohttp.ClientSession, timeout: float, think: float):
+        self.telegram = telegram
+        self.http = http
+        self.timeout = timeout
+        self.think = think
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def run_action(self, user_id: int, scenario: Scenario, init_data: str) -> bool:
+        start = time.perf_counter()
+        try:
+            if scenario.command is None and scenario.callback is None:
+                async with self.http.get(f"{WEBAPP_URL}/api/matches",
+                                         headers={"X-Telegram-Init-Data": init_data}) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+            else:
+                reply = self.telegram.expect(user_id, scenario.done)
+                if scenario.command is not None:
+                    self.telegram.push(message_update(user_id, scenario.command))
+                else:
+                    self.telegram.push(callback_update(user_id, scenario.callback))
+                await asyncio.wait_for(reply, timeout=self.timeout)
+                ok = True
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            self.telegram.cancel(user_id)
+            ok = False
+        if ok:
+            self.latencies[scenario.name].append(time.perf_counter() - start)
+        else:
+            self.errors[scenario.name] += 1
+        return ok
+
+    async def user(self, user_id: int, deadline: float):
+        init_data = sign_init_data(user_id)
+        weights = [s.weight for s in SCENARIOS]
+        while time.monotonic() < deadline:
+            await self.run_action(user_id, random.choices(SCENARIOS, weights=weights)[0], init_data)
+            if self.think:
+                await asyncio.sleep(random.uniform(0, 2 * self.think))
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def report(driver: LoadDriver, elapsed: float, upstream: Dict[str, int], telegram_calls: Dict[str, int]):
+    print(f"\n{'scenario':<22}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}")
+    total = errors = 0
+    everything: List[float] = []
+    for scenario in SCENARIOS:
+        values = driver.latencies.get(scenario.name, [])
+        err = driver.errors.get(scenario.name, 0)
+        total += len(values)
+        errors += err
+        everything += values
+        if not values:
+            print(f"{scenario.name:<22}{0:>8}{err:>6}")
+            continue
+        print(f"{scenario.name:<22}{len(values):>8}{err:>6}{percentile(values, 0.5):>10.1f}"
+              f"{percentile(values, 0.95):>10.1f}{percentile(values, 0.99):>10.1f}{len(values) / elapsed:>9.1f}")
+    if everything:
+        print(f"{'all':<22}{total:>8}{errors:>6}{percentile(everything, 0.5):>10.1f}"
+              f"{percentile(everything, 0.95):>10.1f}{percentile(everything, 0.99):>10.1f}{total / elapsed:>9.1f}")
+    print(f"\nupstream API-Sport calls: {sum(upstream.values())} ({', '.join(f'{k}: {v}' for k, v in upstream.items())})")
+    print("Telegram Bot API calls: " + ", ".join(f"{k}: {v}" for k, v in sorted(telegram_calls.items())))
+
+
+def bot_env(args, api_port: int, telegram_port: int, db_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "API_SPORT_KEY": "bench",
+        "API_SPORT_BASE_URL": f"http://127.0.0.1:{api_port}/v1/football",
+        "API_SPORT_QUOTA_PER_MINUTE": "0",
+        "TELEGRAM_API_BASE": f"http://127.0.0.1:{telegram_port}",
+        "BOT_MODE": "polling",
+        "DB_PATH": db_path,
+    })
+    if not args.keep_limits:
+        # Меряем сам бот, а не лимиты Telegram и защиту от флуда
+        env.update({
+            "SEND_GLOBAL_RATE": "100000", "SEND_PER_CHAT_RATE": "100000",
+            "THROTTLE_RATE": "100000", "THROTTLE_BURST": "100000", "THROTTLE_DUPLICATE_WINDOW": "0",
+        })
+    return env
+
+
+async def wait_ready(http: aiohttp.ClientSession, telegram: FakeTelegram, bot: asyncio.subprocess.Process,
+                     timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if bot.returncode is not None:
+            raise RuntimeError(f"Бот завершился с кодом {bot.returncode}")
+        try:
+            async with http.get(f"{WEBAPP_URL}/api/internal/send/stats") as resp:
+                if resp.status == 200 and telegram.polls:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Бот не запустился")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50, help="одновременных пользователей")
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд нагрузки")
+    parser.add_argument("--warmup", type=float, default=3.0, help="секунд прогрева без учета")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="средняя пауза пользователя между действиями")
+    parser.add_argument("--timeout", type=float, default=10.0, help="ожидание ответа бота, с")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--telegram-port", type=int, default=8082)
+    parser.add_argument("--keep-limits", action="store_true",
+                        help="не отключать лимиты отправки и троттлинг пользователей")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    api_sport = from_args(args)
+    telegram = FakeTelegram()
+    runners = [await start_api_sport(api_sport, args.api_port), await start_telegram(telegram, args.telegram_port)]
+    db_dir = tempfile.TemporaryDirectory()
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", cwd=APP_DIR,
+        env=bot_env(args, args.api_port, args.telegram_port, os.path.join(db_dir.name, "bench.db")),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as http:
+            await wait_ready(http, telegram, bot)
+            print(f"users: {args.users}, duration: {args.duration}s, matches: {len(api_sport.matches)}, "
+                  f"upstream latency: {args.latency_ms}±{args.jitter_ms} ms")
+
+            warmup = LoadDriver(telegram, http, args.timeout, args.think_ms / 1000)
+            deadline = time.monotonic() + args.warmup
+            await asyncio.gather(*(warmup.user(1000 + i, deadline) for i in range(args.users)))
+
+            upstream_before = dict(api_sport.calls)
+            telegram_before = dict(telegram.calls)
+            driver = LoadDriver(telegram, http, args.timeout, args.think_ms / 1000)
+            start = time.monotonic()
+            await asyncio.gather(*(driver.user(1000 + i, start + args.duration) for i in range(args.users)))
+            elapsed = time.monotonic() - start
+
+        upstream = {k: v - upstream_before.get(k, 0) for k, v in api_sport.calls.items()}
+        telegram_calls = {k: v - telegram_before.get(k, 0) for k, v in telegram.calls.items()
+                          if v - telegram_before.get(k, 0)}
+        report(driver, elapsed, upstream, telegram_calls)
+    finally:
+        if bot.returncode is None:
+            bot.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(bot.wait(), timeout=30)
+            except asyncio.TimeoutError:
+                bot.kill()
+        for runner in runners:
+            await runner.cleanup()
+        db_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
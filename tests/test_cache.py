@@ -0,0 +1,71 @@
+# Single-flight кэш: отмена загружающего запроса не роняет ждущих.
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from cache import TTLCache  # noqa: E402
+
+
+def test_owner_cancel_retries_for_waiters():
+    async def scenario():
+        cache = TTLCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        owner = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_load("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        return await asyncio.gather(*waiters), len(calls), owner
+
+    results, calls, owner = asyncio.run(scenario())
+    assert owner.cancelled()
+    # Один из ждущих загрузил заново, остальные получили его результат
+    assert results == [2, 2, 2]
+    assert calls == 2
+
+
+def test_loader_error_reaches_waiters_and_is_not_cached():
+    async def scenario():
+        cache = TTLCache()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)), return_exceptions=True)
+        return results, cache.get("k")
+
+    results, cached = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert cached is None
+
+
+def test_waiter_cancel_keeps_shared_load():
+    async def scenario():
+        cache = TTLCache()
+
+        async def loader():
+            await asyncio.sleep(0.02)
+            return "value"
+
+        owner = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await owner
+
+    assert asyncio.run(scenario()) == "value"
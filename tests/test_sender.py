@@ -0,0 +1,39 @@
+# Очередь отправки: склеиваются только ответы одной группы.
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from sender import SendQueue  # noqa: E402
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+        return len(self.sent)
+
+
+def run_queue(submits):
+    async def scenario():
+        bot = FakeBot()
+        queue = SendQueue(bot, global_rate=1000, per_chat_rate=1000, workers=1)
+        futures = [queue.submit(1, text, group=group) for text, group in submits]
+        queue.start()
+        await asyncio.gather(*futures)
+        await queue.stop()
+        return [text for _, text in bot.sent]
+
+    return asyncio.run(scenario())
+
+
+def test_same_group_is_coalesced():
+    assert run_queue([("a", "cmd1"), ("b", "cmd1")]) == ["a\n\nb"]
+
+
+def test_different_commands_are_not_glued():
+    assert run_queue([("a", "cmd1"), ("b", "cmd2"), ("c", None), ("d", None)]) == ["a", "b", "c", "d"]
@@ -0,0 +1,37 @@
+# Подписки на избранные команды: поиск подписчиков по командам матча.
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from notifications import SubscriberIndex  # noqa: E402
+from team_index import TeamIndex  # noqa: E402
+
+
+def make_index():
+    index = TeamIndex({"псж": "ПСЖ"})
+    subscribers = SubscriberIndex(index.keys_for)
+    return index, subscribers
+
+
+def test_subscriber_found_by_spelling():
+    index, subscribers = make_index()
+    index.add("Реал Мадрид", 1)
+    subscribers.add(7, "Реал Мадрид")
+    assert subscribers.subscribers([("РЕАЛ  мадрид", 1)]) == {7}
+    assert subscribers.subscribers([("Барселона", 2)]) == set()
+
+
+def test_subscriber_survives_rename_in_fixtures():
+    index, subscribers = make_index()
+    index.add("Пари Сен-Жермен", 85)
+    subscribers.add(7, index.resolve("Пари Сен-Жермен").name)
+    index.add("Paris Saint-Germain", 85)
+    assert subscribers.subscribers([("Paris Saint-Germain", 85)]) == {7}
+
+
+def test_seeded_alias_without_fixtures_has_no_id():
+    index, _ = make_index()
+    index.add("ПСЖ")
+    assert index.resolve("псж").team_id is None
@@ -0,0 +1,35 @@
+# Индекс команд: снимки матчей и одноименные команды.
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from team_index import TeamIndex  # noqa: E402
+
+
+def match(home, home_id, away, away_id, tournament="Лига"):
+    return SimpleNamespace(home_name=home, home_id=home_id, away_name=away, away_id=away_id,
+                           tournament_name=tournament)
+
+
+def test_snapshot_adds_only_new_teams():
+    index = TeamIndex()
+    matches = [match(f"Команда {i}", 2 * i, f"Гости {i}", 2 * i + 1) for i in range(300)]
+    assert asyncio.run(index.on_snapshot(SimpleNamespace(matches=matches))) == 600
+    assert asyncio.run(index.on_snapshot(SimpleNamespace(matches=matches))) == 0
+    assert index.resolve("команда 42").team_id == 84
+
+
+def test_same_name_different_id_is_kept():
+    index = TeamIndex()
+    snapshot = SimpleNamespace(matches=[match("Арсенал", 1, "Челси", 2, "АПЛ"),
+                                        match("Арсенал", 3, "Зенит", 4, "РПЛ")])
+    asyncio.run(index.on_snapshot(snapshot))
+    hits = index.search("арсенал")
+    assert {(h.team.team_id, h.team.tournament) for h in hits[:2]} == {(1, "АПЛ"), (3, "РПЛ")}
+    # Угадывать между одноименными командами не беремся
+    assert index.resolve("арсенал") is None
+    assert index.get(3).name == "Арсенал"
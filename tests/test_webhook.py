@@ -0,0 +1,72 @@
+# Webhook-маршрут: записанный Update от Telegram через TestClient FastAPI.
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+SECRET = "test-secret"
+os.environ.update({
+    "TELEGRAM_BOT_TOKEN": "42:TEST",
+    "API_SPORT_KEY": "test",
+    "BOT_MODE": "webhook",
+    "WEBHOOK_BASE_URL": "https://bot.example.com",
+    "WEBHOOK_SECRET": SECRET,
+    "DB_PATH": os.path.join(tempfile.mkdtemp(), "test.db"),
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+UPDATE = json.loads((ROOT / "tests" / "data" / "update_matches.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def fed(monkeypatch):
+    updates = []
+
+    async def feed_update(bot, update):
+        updates.append(update)
+
+    monkeypatch.setattr(main.dp, "feed_update", feed_update)
+    return updates
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}])
+def test_rejects_bad_secret(client, fed, headers):
+    response = client.post(main.WEBHOOK_PATH, json=UPDATE, headers=headers)
+    assert response.status_code == 401
+    assert fed == []
+
+
+@pytest.mark.parametrize("body", [b"not json", b'{"message": "no update_id"}'])
+def test_rejects_malformed_update(client, fed, body):
+    response = client.post(main.WEBHOOK_PATH, content=body,
+                           headers={"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert fed == []
+
+
+def test_feeds_matches_update_to_dispatcher(client, fed):
+    response = client.post(main.WEBHOOK_PATH, json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+    assert response.status_code == 200
+    # Обработка идет фоновой задачей в loop TestClient
+    deadline = time.monotonic() + 2
+    while not fed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(fed) == 1
+    assert fed[0].update_id == UPDATE["update_id"]
+    assert fed[0].message.text == "/matches"